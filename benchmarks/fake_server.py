@@ -0,0 +1,496 @@
+"""
+Local stand-in for the Sketchfab API, to run the benchmarks (and tests) without a token nor network access.
+
+It implements the endpoints used by `SFModelsApi` and `SFCollectionsApi` on an in-memory catalog: search with cursor
+pagination, model get/patch, upload, download URLs and archives (with `Range` support), collections and comments.
+A latency can be added to every response and 429 responses can be injected to exercise the rate limiting.
+
+```python
+with FakeSketchfab(models=100) as server:
+    clt = SFClient('fake', api_url=server.api_url)
+    print(len(clt.models()))
+```
+"""
+import email.utils
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def make_archive(size: int) -> bytes:
+    """A glTF zip archive of about `size` bytes, with an incompressible buffer"""
+    b = io.BytesIO()
+    with zipfile.ZipFile(b, 'w', zipfile.ZIP_STORED) as z:
+        z.writestr('scene.gltf', json.dumps({
+            'asset': {'version': '2.0'},
+            'buffers': [{'uri': 'scene.bin', 'byteLength': size}],
+        }))
+        z.writestr('scene.bin', hashlib.shake_256(b'sketchfab').digest(max(size, 1)))
+        z.writestr('license.txt', 'CC-BY-4.0')
+    return b.getvalue()
+
+
+def model_json(i: int, uid: str = None) -> Dict[str, Any]:
+    """A model shaped like the ones of the API"""
+    uid = uid or f'{i:032x}'
+    date = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(1546300800 + i * 3600))
+    return {
+        'uid': uid,
+        'uri': f'https://api.sketchfab.com/v3/models/{uid}',
+        'name': f'kitchenModSink{i}x65x210',
+        'description': 'Kitchen module with a sink',
+        'tags': [{'name': 'kitchen', 'slug': 'kitchen'}, {'name': 'sink', 'slug': 'sink'}],
+        'categories': [{'name': 'Furniture & Home', 'slug': 'furniture-home'}],
+        'viewerUrl': f'https://sketchfab.com/3d-models/{uid}',
+        'createdAt': date,
+        'updatedAt': date,
+        'publishedAt': date,
+        'isPublished': True,
+        'private': False,
+        'isDownloadable': True,
+        'vertexCount': 1024 + i,
+        'faceCount': 2048 + i,
+        'status': {'processing': 'SUCCEEDED'},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, Nagle's algorithm would delay the body of keep-alive responses
+    disable_nagle_algorithm = True
+    server: '_Server'
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def _body(self) -> bytes:
+        return b''.join(self._body_chunks())
+
+    def _body_chunks(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                yield self.rfile.read(size)
+                self.rfile.readline()
+        remaining = int(self.headers.get('Content-Length') or 0)
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 1 << 16))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+    def send(self, status: int, body: Any = b'', headers: Dict[str, str] = None, content_type='application/json'):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        if body or status not in (204, 304):
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _dispatch(self, method: str):
+        fake = self.server.fake
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        fake.count_request(method, parsed.path)
+        if parsed.path in fake.broken:
+            self._body()
+            self.close_connection = True
+            return None
+        if fake.latency:
+            time.sleep(fake.latency)
+        for route_method, pattern, handler in fake.routes:
+            if route_method != method:
+                continue
+            m = pattern.match(parsed.path)
+            if m:
+                if parsed.path.startswith('/v3/') and fake.should_rate_limit():
+                    self._body()
+                    return self.send(429, {'detail': 'Too many requests'},
+                                     headers={'Retry-After': str(fake.retry_after)})
+                return handler(self, query, *m.groups())
+        self._body()
+        return self.send(404, {'detail': 'Not found'})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: 'FakeSketchfab'
+
+
+class FakeSketchfab:
+    """
+    Fake Sketchfab API server, listening on a local port in a background thread.
+
+    All the models belong to the token owner and are public. The state is exposed (`models`, `collections`,
+    `comments`, `uploads`) so that tests can check the effects of the requests.
+    """
+
+    def __init__(
+            self,
+            models: int = 0,
+            collections: int = 0,
+            archive_size: int = 1 << 20,
+            latency: float = 0,
+            rate_limit_every: int = 0,
+            retry_after: int = 1,
+            max_count: int = 24,
+            url_ttl: int = 300,
+            max_results: int = 0,
+            processing_time: float = 0,
+            host: str = '127.0.0.1',
+            port: int = 0,
+    ):
+        """
+        :param models: Number of models to create
+        :param collections: Number of collections to create, the models are spread among them
+        :param archive_size: Size of the archive served for each model (in bytes)
+        :param latency: Time (in seconds) added to every response
+        :param rate_limit_every: Answer every n-th API request with a 429 (never if 0)
+        :param retry_after: `Retry-After` of the 429 responses (in seconds)
+        :param max_count: Maximum page size of the listings
+        :param max_results: Number of results after which the listings stop paginating (no limit if 0)
+        :param url_ttl: Validity (in seconds) of the download URLs, they are refused with a 403 afterwards
+        :param processing_time: Time (in seconds) the uploaded models stay in the PENDING processing status
+        """
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.max_count = max_count
+        self.url_ttl = url_ttl
+        self.max_results = max_results
+        self.processing_time = processing_time
+        self.processing: Dict[str, float] = {}
+        """Time at which each uploaded model being processed will be done"""
+        self.archive = make_archive(archive_size)
+        self.archive_etag = f'"{hashlib.md5(self.archive).hexdigest()}"'
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.collections: Dict[str, Dict[str, Any]] = {}
+        self.collection_models: Dict[str, List[str]] = {}
+        self.comments: List[Dict[str, str]] = []
+        self.uploads: List[int] = []
+        """Size of the bodies of the uploads"""
+        self.requests = 0
+        """Number of requests received"""
+        self.rate_limited = 0
+        """Number of 429 responses sent"""
+        self.log: List[Tuple[float, str, str]] = []
+        """Time (`time.monotonic()`), method and path of the requests, when they were received"""
+        self.broken: Set[str] = set()
+        """Paths (like `/v3/models/<uid>`) whose requests are dropped without any response"""
+        self._lock = threading.Lock()
+        self._next_id = 0
+        for _ in range(models):
+            self.add_model()
+        uids = list(self.models)
+        for i in range(collections):
+            self.add_collection(f'collection {i}', uids[i::collections])
+
+        self.routes: List[Tuple[str, Any, Callable]] = [
+            ('GET', re.compile(r'^/v3/search$'), self._search),
+            ('GET', re.compile(r'^/v3/me/search$'), self._search),
+            ('GET', re.compile(r'^/v3/me/models$'), self._search),
+            ('GET', re.compile(r'^/v3/models/(\w+)$'), self._get_model),
+            ('PATCH', re.compile(r'^/v3/models/(\w+)$'), self._patch_model),
+            ('POST', re.compile(r'^/v3/models$'), self._upload),
+            ('GET', re.compile(r'^/v3/models/(\w+)/download$'), self._download),
+            ('GET', re.compile(r'^/archives/(\w+)\.zip$'), self._archive),
+            ('POST', re.compile(r'^/v3/comments$'), self._comment),
+            ('GET', re.compile(r'^/v3/me/collections$'), self._list_collections),
+            ('POST', re.compile(r'^/v3/collections$'), self._create_collection),
+            ('GET', re.compile(r'^/v3/collections/(\w+)$'), self._get_collection),
+            ('PATCH', re.compile(r'^/v3/collections/(\w+)$'), self._patch_collection),
+            ('POST', re.compile(r'^/v3/collections/(\w+)/models$'), self._add_models),
+            ('DELETE', re.compile(r'^/v3/collections/(\w+)/models$'), self._remove_models),
+        ]
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def api_url(self) -> str:
+        """URL to pass to `SFClient(api_url=...)`"""
+        return f'{self.url}/v3'
+
+    def start(self) -> 'FakeSketchfab':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-sketchfab', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeSketchfab':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _new_uid(self) -> str:
+        with self._lock:
+            self._next_id += 1
+            return f'{self._next_id:032x}'
+
+    def add_model(self, **fields) -> str:
+        uid = self._new_uid()
+        self.models[uid] = dict(model_json(int(uid, 16), uid), **fields)
+        return uid
+
+    def add_collection(self, name: str, uids: List[str] = ()) -> str:
+        uid = self._new_uid()
+        self.collections[uid] = {'uid': uid, 'name': name}
+        self.collection_models[uid] = list(uids)
+        return uid
+
+    def count_request(self, method: str, path: str):
+        with self._lock:
+            self.requests += 1
+            self.log.append((time.monotonic(), method, path))
+
+    def should_rate_limit(self) -> bool:
+        if not self.rate_limit_every:
+            return False
+        with self._lock:
+            if self.requests % self.rate_limit_every:
+                return False
+            self.rate_limited += 1
+            return True
+
+    @staticmethod
+    def _etag(model: Dict[str, Any]) -> str:
+        return f'"{hashlib.md5(json.dumps(model, sort_keys=True).encode()).hexdigest()}"'
+
+    @staticmethod
+    def _now() -> str:
+        return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime())
+
+    def _page(self, h: _Handler, query: Dict[str, str], items: List[Dict[str, Any]]):
+        count = min(int(query.get('count', 24)), self.max_count)
+        offset = int(query.get('cursor') or 0)
+        if self.max_results:
+            items = items[:self.max_results]
+        next_cursor = str(offset + count) if offset + count < len(items) else None
+        next_url = None
+        if next_cursor:
+            next_url = f'{self.url}{urlparse(h.path).path}?' + '&'.join(
+                f'{k}={v}' for k, v in dict(query, cursor=next_cursor).items()
+            )
+        h.send(200, {
+            'results': items[offset:offset + count],
+            'cursors': {'next': next_cursor, 'previous': str(max(0, offset - count)) if offset else None},
+            'next': next_url,
+            'previous': None,
+        })
+
+    def _process(self):
+        """Finish the processing of the uploaded models whose time has come"""
+        now = time.time()
+        with self._lock:
+            for uid, done_at in list(self.processing.items()):
+                if done_at <= now:
+                    del self.processing[uid]
+                    if uid in self.models:
+                        self.models[uid]['status'] = {'processing': 'SUCCEEDED'}
+
+    def _search(self, h: _Handler, query: Dict[str, str]):
+        h._body()
+        self._process()
+        models = list(self.models.values())
+        if query.get('collection'):
+            members = set(self.collection_models.get(query['collection'], []))
+            models = [m for m in models if m['uid'] in members]
+        if query.get('tags'):
+            models = [m for m in models if query['tags'] in [t['slug'] for t in m.get('tags') or []]]
+        if query.get('published_since'):
+            models = [m for m in models if (m.get('publishedAt') or '') >= query['published_since']]
+        sort_by = query.get('sort_by')
+        if sort_by:
+            key = re.sub(r'_(\w)', lambda m: m.group(1).upper(), sort_by.lstrip('-'))
+            models.sort(key=lambda m: m.get(key) or '', reverse=sort_by.startswith('-'))
+        self._page(h, query, models)
+
+    def _get_model(self, h: _Handler, _query, uid: str):
+        h._body()
+        self._process()
+        model = self.models.get(uid)
+        if model is None:
+            return h.send(404, {'detail': 'Not found'})
+        etag = self._etag(model)
+        if h.headers.get('If-None-Match') == etag:
+            return h.send(304, headers={'ETag': etag})
+        return h.send(200, model, headers={'ETag': etag})
+
+    def _patch_model(self, h: _Handler, _query, uid: str):
+        data = {k: v[0] for k, v in parse_qs(h._body().decode()).items()}
+        model = self.models.get(uid)
+        if model is None:
+            return h.send(404, {'detail': 'Not found'})
+        for k, v in data.items():
+            if k in ('tags', 'categories', 'options'):
+                v = json.loads(v)
+                if k != 'options':
+                    v = [{'name': x, 'slug': x} if isinstance(x, str) else x for x in v]
+            elif v in ('true', 'True', 'false', 'False'):
+                v = v.lower() == 'true'
+            model[k] = v
+        model['updatedAt'] = self._now()
+        return h.send(204)
+
+    def _upload(self, h: _Handler, _query):
+        size = 0
+        head = b''
+        for chunk in h._body_chunks():
+            if len(head) < 1 << 16:
+                head += chunk[:(1 << 16) - len(head)]
+            size += len(chunk)
+        self.uploads.append(size)
+        fields = {
+            name.decode(): value.decode(errors='replace')
+            for name, value in re.findall(rb'name="(\w+)"\r\n\r\n(.*?)\r\n--', head, re.S)
+        }
+        if 'tags' in fields:
+            fields['tags'] = [{'name': t, 'slug': t} for t in json.loads(fields['tags'])]
+        uid = self.add_model(publishedAt=None, isPublished=False, createdAt=self._now(), updatedAt=self._now(),
+                             **{k: v for k, v in fields.items() if k in ('name', 'description', 'tags')})
+        if self.processing_time:
+            self.models[uid]['status'] = {'processing': 'PENDING'}
+            with self._lock:
+                self.processing[uid] = time.time() + self.processing_time
+        return h.send(201, {'uid': uid, 'uri': f'{self.api_url}/models/{uid}'},
+                      headers={'Location': f'{self.api_url}/models/{uid}'})
+
+    def _download(self, h: _Handler, _query, uid: str):
+        h._body()
+        if uid not in self.models:
+            return h.send(404, {'detail': 'Not found'})
+        return h.send(200, {
+            'gltf': {
+                'url': f'{self.url}/archives/{uid}.zip?expires={time.time() + self.url_ttl:.0f}',
+                'size': len(self.archive),
+                'expires': self.url_ttl,
+            },
+        })
+
+    def _archive(self, h: _Handler, query: Dict[str, str], uid: str):
+        h._body()
+        if uid not in self.models:
+            return h.send(404, b'', content_type='application/xml')
+        if float(query.get('expires', 'inf')) < time.time():
+            return h.send(403, b'<Error><Code>AccessDenied</Code></Error>', content_type='application/xml')
+        data = self.archive
+        total = len(data)
+        start, end, status = 0, total - 1, 200
+        headers = {'ETag': self.archive_etag, 'Accept-Ranges': 'bytes',
+                   'Last-Modified': email.utils.formatdate(usegmt=True)}
+        m = re.match(r'bytes=(\d*)-(\d*)$', h.headers.get('Range', ''))
+        if m:
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), total - 1) if m.group(2) else total - 1
+            else:
+                start = max(0, total - int(m.group(2)))
+            if start >= total:
+                return h.send(416, b'', headers={'Content-Range': f'bytes */{total}'}, content_type='text/plain')
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{total}'
+        h.send_response(status)
+        h.send_header('Content-Type', 'application/zip')
+        h.send_header('Content-Length', str(end - start + 1))
+        for k, v in headers.items():
+            h.send_header(k, v)
+        h.end_headers()
+        view = memoryview(data)
+        for offset in range(start, end + 1, 1 << 16):
+            h.wfile.write(view[offset:min(offset + (1 << 16), end + 1)])
+
+    def _comment(self, h: _Handler, _query):
+        data = {k: v[0] for k, v in parse_qs(h._body().decode()).items()}
+        if data.get('model') not in self.models:
+            return h.send(400, {'model': ['Unknown model']})
+        self.comments.append(data)
+        return h.send(201, {'uid': self._new_uid()})
+
+    def _list_collections(self, h: _Handler, query: Dict[str, str]):
+        h._body()
+        self._page(h, query, [self._collection_json(uid) for uid in self.collections])
+
+    def _collection_json(self, uid: str) -> Dict[str, Any]:
+        return dict(self.collections[uid], modelCount=len(self.collection_models[uid]))
+
+    def _create_collection(self, h: _Handler, _query):
+        data = json.loads(h._body() or b'{}')
+        uid = self.add_collection(data.get('name', ''), [u for u in data.get('models', []) if u in self.models])
+        return h.send(201, self._collection_json(uid), headers={'Location': f'{self.api_url}/collections/{uid}'})
+
+    def _get_collection(self, h: _Handler, _query, uid: str):
+        h._body()
+        if uid not in self.collections:
+            return h.send(404, {'detail': 'Not found'})
+        return h.send(200, self._collection_json(uid))
+
+    def _patch_collection(self, h: _Handler, _query, uid: str):
+        data = {k: v[0] for k, v in parse_qs(h._body().decode()).items()}
+        if uid not in self.collections:
+            return h.send(404, {'detail': 'Not found'})
+        self.collections[uid].update(data)
+        return h.send(200, self._collection_json(uid))
+
+    def _change_models(self, h: _Handler, uid: str) -> Optional[List[str]]:
+        uids = json.loads(h._body() or b'{}').get('models', [])
+        if uid not in self.collections:
+            h.send(404, {'detail': 'Not found'})
+            return None
+        unknown = [u for u in uids if u not in self.models]
+        if unknown:
+            h.send(400, {'models': [f'Unknown models: {", ".join(unknown)}']})
+            return None
+        return uids
+
+    def _add_models(self, h: _Handler, _query, uid: str):
+        uids = self._change_models(h, uid)
+        if uids is not None:
+            with self._lock:
+                members = self.collection_models[uid]
+                members.extend(u for u in uids if u not in members)
+            h.send(201, self._collection_json(uid))
+
+    def _remove_models(self, h: _Handler, _query, uid: str):
+        uids = self._change_models(h, uid)
+        if uids is not None:
+            with self._lock:
+                removed = set(uids)
+                self.collection_models[uid] = [u for u in self.collection_models[uid] if u not in removed]
+            h.send(204)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Memory used per `SFModel` of a large listing.
+
+Compares the previous representation (a plain object holding the decoded JSON) with the current one, fully
+decoded, projected on a few fields (the `fields` of the listings) and kept as raw JSON until accessed (like the
+models of `get_model`). Most of the memory is held by the decoded JSON, so only the projection makes a difference
+for the listings.
+
+    python3 -m benchmarks.model_memory [count]
+"""
+import json
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from sketchfab.models import SFModel, project
+
+
+class LegacySFModel:
+    """`SFModel` as it was before `__slots__` and lazy decoding"""
+
+    def __init__(self, j: Dict[str, Any] = None, clt=None):
+        self.json = j if j else {}
+        self.modified: List[str] = []
+        self.clt = clt
+
+
+def search_result(i: int) -> Dict[str, Any]:
+    """A search result shaped like the ones of the API"""
+    uid = f'{i:032x}'
+    return {
+        'uri': f'https://api.sketchfab.com/v3/models/{uid}',
+        'uid': uid,
+        'name': f'kitchenModSink{i}x65x210',
+        'description': 'Kitchen module with a sink',
+        'tags': [{'name': 'kitchen', 'slug': 'kitchen'}, {'name': 'sink', 'slug': 'sink'}],
+        'categories': [{'name': 'Furniture & Home', 'slug': 'furniture-home'}],
+        'viewerUrl': f'https://sketchfab.com/3d-models/{uid}',
+        'embedUrl': f'https://sketchfab.com/models/{uid}/embed',
+        'createdAt': '2019-10-20T21:12:24.417000',
+        'updatedAt': '2019-10-21T08:02:11.120000',
+        'publishedAt': None,
+        'isDownloadable': True,
+        'vertexCount': 1024 + i,
+        'faceCount': 2048 + i,
+        'thumbnails': {'images': [
+            {'url': f'https://media.sketchfab.com/models/{uid}/thumbnails/{w}.jpeg', 'width': w, 'height': w * 9 // 16,
+             'size': w * 40, 'uid': f'{i:016x}{w:016x}'}
+            for w in (1920, 1024, 720, 256, 64)
+        ]},
+        'archives': {fmt: {'size': 100000 + i, 'type': fmt} for fmt in ('gltf', 'glb', 'usdz', 'source')},
+        'user': {'uid': 'ab' * 16, 'username': 'habx', 'displayName': 'Habx', 'profileUrl': 'https://sketchfab.com/habx'},
+        'license': None,
+        'status': {'processing': 'SUCCEEDED'},
+    }
+
+
+def measure(build: Callable[[], List[Any]]) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(objects)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    raw_page = json.dumps([search_result(i) for i in range(count)])
+    raw_items = [json.dumps(search_result(i)) for i in range(count)]
+    fields = ['uid', 'name', 'updatedAt', 'tags']
+
+    results = {
+        'legacy (decoded dict)': measure(lambda: [LegacySFModel(m) for m in json.loads(raw_page)]),
+        'slots (decoded dict)': measure(lambda: [SFModel(m) for m in json.loads(raw_page)]),
+        'slots (projected)': measure(lambda: [SFModel(project(m, fields)) for m in json.loads(raw_page)]),
+        'slots (raw, not accessed)': measure(lambda: [SFModel(r.encode()) for r in raw_items]),
+    }
+    print(f"Memory per model, over {count} models:")
+    for name, size in results.items():
+        print(f"  {name:28s} {size:10.0f} B")
+
+
+if __name__ == '__main__':
+    main()
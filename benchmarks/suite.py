@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks of the client, run against `benchmarks.fake_server` so that results are reproducible and
+comparable across releases.
+
+    python3 -m benchmarks.suite [--repeat 3] [--output results.json] [--compare baseline.json] [--tolerance 0.2]
+
+Each benchmark runs with fixed parameters (catalog size, archive size, simulated latency) and the median of the
+repetitions is reported. With `--compare`, the results are checked against a previous run and the command fails if
+any of them regressed by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple
+
+import sketchfab
+from sketchfab.clt import SFClient
+from sketchfab.models import SFModel
+
+from benchmarks.fake_server import FakeSketchfab
+
+
+class Benchmark(NamedTuple):
+    name: str
+    unit: str
+    higher_is_better: bool
+    run: Callable[[], float]
+
+
+def listing_throughput(prefetch: bool) -> float:
+    """Models listed per second, over 100 pages with a 5 ms latency"""
+    with FakeSketchfab(models=2400, latency=0.005) as server:
+        clt = SFClient('fake', api_url=server.api_url)
+        start = time.perf_counter()
+        count = sum(1 for _ in clt.iter_models(count=24, prefetch=prefetch))
+        return count / (time.perf_counter() - start)
+
+
+def download_throughput() -> float:
+    """MB/s downloaded by `download_many` for 16 models of 8 MB with 4 workers"""
+    with FakeSketchfab(models=16, archive_size=8 << 20) as server:
+        clt = SFClient('fake', api_url=server.api_url)
+        models = clt.models()
+        dest_dir = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            paths = clt.download_many(models, dest_dir, workers=4)
+            duration = time.perf_counter() - start
+            size = sum(os.path.getsize(p) for p in paths.values())
+        finally:
+            shutil.rmtree(dest_dir)
+        return size / duration / 1e6
+
+
+def upload_memory_peak() -> float:
+    """Peak of memory allocated (in MB) while uploading a 64 MB file"""
+    fd, path = tempfile.mkstemp(suffix='.zip')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(64):
+                f.write(os.urandom(1 << 20))
+        with FakeSketchfab() as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            tracemalloc.start()
+            try:
+                clt.upload_model(path, SFModel())
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return peak / 1e6
+    finally:
+        os.remove(path)
+
+
+def collection_operations() -> float:
+    """Models added to and removed from a collection per second, 1000 models with a 5 ms latency"""
+    with FakeSketchfab(models=1000, latency=0.005) as server:
+        clt = SFClient('fake', api_url=server.api_url)
+        models = [SFModel({'uid': uid}, clt) for uid in server.models]
+        start = time.perf_counter()
+        collection = clt.create_collection('benchmark', [])
+        collection.add_models(models)
+        collection.remove_models(models)
+        return 2 * len(models) / (time.perf_counter() - start)
+
+
+def rate_limited_requests() -> float:
+    """`get_model` calls per second with 8 threads when every 20th request gets a 429"""
+    with FakeSketchfab(models=400, latency=0.002, rate_limit_every=20, retry_after=0) as server:
+        clt = SFClient('fake', api_url=server.api_url)
+        uids = list(server.models)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert all(executor.map(clt.get_model, uids))
+        return len(uids) / (time.perf_counter() - start)
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark('listing', 'models/s', True, lambda: listing_throughput(prefetch=False)),
+    Benchmark('listing_prefetch', 'models/s', True, lambda: listing_throughput(prefetch=True)),
+    Benchmark('download_many', 'MB/s', True, download_throughput),
+    Benchmark('upload_memory_peak', 'MB', False, upload_memory_peak),
+    Benchmark('collection_operations', 'models/s', True, collection_operations),
+    Benchmark('rate_limited_get_model', 'requests/s', True, rate_limited_requests),
+]
+
+
+def run(names: List[str] = None, repeat: int = 3) -> Dict[str, Any]:
+    results = {}
+    for b in BENCHMARKS:
+        if names and b.name not in names:
+            continue
+        values = [b.run() for _ in range(repeat)]
+        results[b.name] = {
+            'value': statistics.median(values),
+            'unit': b.unit,
+            'higher_is_better': b.higher_is_better,
+            'values': values,
+        }
+        print(f"{b.name:26s} {results[b.name]['value']:12.2f} {b.unit}", file=sys.stderr)
+    return {
+        'version': sketchfab.VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Names of the benchmarks that regressed by more than `tolerance` (a ratio) compared to the baseline"""
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous or not previous['value']:
+            continue
+        ratio = result['value'] / previous['value']
+        if not result['higher_is_better']:
+            ratio = 1 / ratio if ratio else float('inf')
+        status = 'REGRESSION' if ratio < 1 - tolerance else 'ok'
+        print(f"{name:26s} {previous['value']:12.2f} -> {result['value']:12.2f} {result['unit']:10s} "
+              f"({ratio:.2f}x) {status}", file=sys.stderr)
+        if status != 'ok':
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the Sketchfab client against a fake server")
+    parser.add_argument('names', nargs='*', help="Benchmarks to run, all of them by default: " +
+                        ", ".join(b.name for b in BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3, help="Number of runs of each benchmark")
+    parser.add_argument('--output', help="File to write the results to (JSON)")
+    parser.add_argument('--compare', help="Results of a previous run to compare to")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Accepted slowdown ratio")
+    args = parser.parse_args()
+
+    results = run(args.names, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -33,9 +33,11 @@ setup(
     packages=["sketchfab"],
     scripts=["scripts/sketchfab"],
     python_requires=">=3.7",
-    install_requires=["requests==2.25.1", "urllib3"],
+    install_requires=["requests==2.25.1", "urllib3>=1.26"],
     extras_require={
         'dev': ['pdoc3'],
+        'async': ['aiohttp'],
+        'inspect': ['numpy'],
     },
     project_urls={  # Optional
         'Bug Reports': 'https://github.com/habx/lib-py-sketchfab/issues',
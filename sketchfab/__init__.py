@@ -1,11 +1,26 @@
 """
 Python client API providing an easy way to manage you models on sketchfab.
 """
-import sketchfab.clt
+import importlib
 
 VERSION = "0.0.8"
 """Current version of the lib"""
 
-Client = clt.SFClient
-"""Shortcut to instantiate the client"""
+_SUBMODULES = (
+    'aio', 'api', 'cache', 'clt', 'crawl', 'dedup', 'gltf', 'jsonstream', 'metrics', 'mirror', 'models',
+    'multipart', 'pager', 'rangefile', 'scheduler', 'writebehind',
+)
 
+
+def __getattr__(name: str):
+    # The HTTP stack is only imported when it's needed, which keeps the CLI startup fast
+    if name == 'Client':
+        from sketchfab.clt import SFClient
+        return SFClient
+    if name in _SUBMODULES:
+        return importlib.import_module(f'sketchfab.{name}')
+    raise AttributeError(f"module 'sketchfab' has no attribute '{name}'")
+
+
+Client: 'sketchfab.clt.SFClient'
+"""Shortcut to instantiate the client (`sketchfab.clt.SFClient`)"""
@@ -0,0 +1,285 @@
+"""
+Asyncio client, built on [aiohttp](https://docs.aiohttp.org) (`pip install sketchfab[async]`).
+
+It mirrors the blocking `sketchfab.clt.SFClient` and returns the same `SFModel` / `SFCollection` objects. These
+objects are bound to the async client: use the client coroutines rather than their blocking helpers
+(`SFModel.comment()`, `SFCollection.add_model()`...).
+"""
+import asyncio
+import datetime
+import logging
+import os
+import random
+import tempfile
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+from sketchfab.api import API_URL, SFModelsApi
+from sketchfab.clt import SFCltAuth, resolve_api_token
+from sketchfab.models import SFModel, SFCollection
+from sketchfab.pager import SFPager
+
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ('HEAD', 'GET', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+
+class AsyncSFClient:
+    """
+    Asyncio Sketchfab client
+
+    Should be used as an async context manager (or closed with `close()`) so that the connection pool is released:
+    ```python
+    async with AsyncSFClient() as clt:
+        models = await asyncio.gather(*[clt.get_model(uid) for uid in uids])
+    ```
+    """
+
+    def __init__(
+            self,
+            api_token: str = None,
+            max_concurrency: int = 100,
+            max_connections: int = 100,
+            max_connections_per_host: int = 0,
+            retries: int = 10,
+            backoff_factor: float = 0.5,
+            api_url: str = API_URL,
+    ):
+        """
+        :param api_token: API token, resolved like `SFClient` does when not passed
+        :param max_concurrency: Maximum number of requests in flight at once
+        :param max_connections: Size of the connection pool
+        :param max_connections_per_host: Size of the connection pool per host (0 for no limit)
+        :param retries: Number of retries on 429 and 5xx errors
+        :param backoff_factor: Backoff factor between retries (in seconds)
+        :param api_url: Base URL of the API
+        """
+        self.api_url = api_url.rstrip('/')
+        self.auth = SFCltAuth(resolve_api_token(api_token))
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Shared aiohttp session, created on first use (from within the event loop)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections_per_host)
+            self._session = aiohttp.ClientSession(connector=connector, raise_for_status=False)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> 'AsyncSFClient':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _retry_delay(self, attempt: int, r: aiohttp.ClientResponse) -> float:
+        retry_after = r.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * (2 ** attempt) * (0.5 + random.random())
+
+    async def _request(self, method: str, url: str, retry: bool = None, **kwargs) -> aiohttp.ClientResponse:
+        """
+        Perform an API request, with the auth header and within the concurrency limit. The response body is read
+        before returning.
+        """
+        session = self.session
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.update(self.auth.headers)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                r = await session.request(method, url, headers=headers, **kwargs)
+                await r.read()
+            # A 429 means the request wasn't processed and can always be retried
+            if r.status in RETRY_STATUSES and (retry or r.status == 429) and attempt < self.retries:
+                delay = self._retry_delay(attempt, r)
+                logging.info("Got %d on %s %s, retrying in %.1fs", r.status, method, url, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            return r
+
+    async def get_model(self, uid: str) -> Optional[SFModel]:
+        r = await self._request('GET', f'{self.api_url}/models/{uid}')
+        if r.status == 200:
+            return SFModel(await r.json(), self)
+        return None
+
+    @staticmethod
+    def _params(params: Dict[str, Any]) -> Dict[str, str]:
+        # aiohttp only accepts strings, this mimics the way requests encodes the other types
+        return {k: str(v) for k, v in params.items() if v is not None}
+
+    async def _list_page(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        r = await self._request('GET', url, params=self._params(params))
+        r.raise_for_status()
+        return await r.json()
+
+    async def list_mines(
+            self,
+            sort_by: str = None,
+            downloadable: bool = None,
+            collection: SFCollection = None,
+    ) -> List[SFModel]:
+        """List the first page of your models (see `iter_mines` to get all of them)"""
+        params = SFModelsApi._list_prepare_params_common(
+            sort_by=sort_by,
+            downloadable=downloadable,
+            collection=collection,
+        )
+        data = await self._list_page(f'{self.api_url}/me/search', params)
+        return [SFModel(m, self) for m in data['results']]
+
+    async def iter_mines(
+            self,
+            sort_by: str = None,
+            downloadable: bool = None,
+            collection: SFCollection = None,
+            count: int = 24,
+            cursor: str = None,
+    ) -> AsyncIterator[SFModel]:
+        """Iterate over all your models, following the listing cursor"""
+        params = SFModelsApi._list_prepare_params_common(
+            sort_by=sort_by,
+            downloadable=downloadable,
+            collection=collection,
+        )
+        async for m in self._iter_pages(f'{self.api_url}/me/search', params, SFModel, count, cursor):
+            yield m
+
+    async def iter_public(
+            self,
+            sort_by: str = None,
+            downloadable: bool = None,
+            published_since: datetime.datetime = None,
+            count: int = 24,
+            cursor: str = None,
+    ) -> AsyncIterator[SFModel]:
+        """Iterate over all the public models, following the listing cursor"""
+        params = SFModelsApi._list_prepare_params_common(
+            downloadable=downloadable,
+            sort_by=sort_by,
+            published_since=published_since,
+        )
+        async for m in self._iter_pages(f'{self.api_url}/search', params, SFModel, count, cursor):
+            yield m
+
+    async def iter_collections(self, count: int = 24, cursor: str = None) -> AsyncIterator[SFCollection]:
+        """Iterate over all your collections, following the listing cursor"""
+        async for c in self._iter_pages(f'{self.api_url}/me/collections', {}, SFCollection, count, cursor):
+            yield c
+
+    async def collections(self) -> List[SFCollection]:
+        return [c async for c in self.iter_collections()]
+
+    async def _iter_pages(self, url: str, params: Dict[str, Any], factory, count: int, cursor: Optional[str]):
+        while True:
+            page_params = dict(params, count=count)
+            if cursor:
+                page_params['cursor'] = cursor
+            page = await self._list_page(url, page_params)
+            for item in page.get('results', []):
+                yield factory(item, self)
+            cursor = SFPager._next_cursor(page)
+            if not cursor:
+                return
+
+    async def upload_model(self, file_path: str, model: SFModel = None) -> Optional[SFModel]:
+        """Upload a model file (see `SFModelsApi.upload_model`)"""
+        if not model:
+            model = SFModel()
+
+        with open(file_path, 'rb') as f:
+            form = aiohttp.FormData()
+            for k, v in SFModelsApi._prepare_update_data(model).items():
+                form.add_field(k, str(v))
+            form.add_field('modelFile', f, filename=os.path.basename(file_path))
+            r = await self._request('POST', f'{self.api_url}/models', data=form, retry=False)
+        r.raise_for_status()
+        if r.status == 201:
+            j = await r.json()
+            model.json['uid'] = j['uid']
+            model.modified = []
+            model.clt = self
+            return model
+        return None
+
+    async def download(self, model: SFModel, chunk_size: int = 65536) -> str:
+        """Download a model as a ZIP file and return the path of the created file"""
+        r = await self._request('GET', f'{self.api_url}/models/{model.uid}/download')
+        r.raise_for_status()
+        url_download = (await r.json())['gltf']['url']
+
+        # The download URL is pre-signed, it must not receive our auth header
+        async with self._semaphore:
+            async with self.session.get(url_download) as r:
+                r.raise_for_status()
+                suffix = f'_{model.uid}'
+                if r.headers.get('content-type') == 'application/zip':
+                    suffix += '.zip'
+                fd, path = tempfile.mkstemp(prefix='sketchfab_', suffix=suffix)
+                # The file is written from the default executor so that the disk never blocks the event loop
+                loop = asyncio.get_running_loop()
+                with os.fdopen(fd, 'wb') as f:
+                    async for chunk in r.content.iter_chunked(chunk_size):
+                        await loop.run_in_executor(None, f.write, chunk)
+        return path
+
+    async def comment(self, model: SFModel, msg: str) -> bool:
+        """Post a comment on a model"""
+        r = await self._request('POST', f'{self.api_url}/comments', data={'model': model.uid, 'body': msg})
+        r.raise_for_status()
+        ok = r.status == 201
+        if not ok:
+            logging.warning("Could not add comment to model %s: %s", model.uid, await r.text())
+        return ok
+
+    async def update_model(self, model: SFModel) -> bool:
+        r = await self._request(
+            'PATCH',
+            f'{self.api_url}/models/{model.uid}',
+            data=self._params(SFModelsApi._prepare_update_data(model)),
+        )
+        model.modified = []
+        return r.status == 204
+
+    async def add_model(self, collection: SFCollection, model: SFModel) -> bool:
+        """Add a model to a collection"""
+        r = await self._request(
+            'POST',
+            f'{self.api_url}/collections/{collection.uid}/models',
+            json={'models': [model.uid]},
+        )
+        ok = r.status == 201
+        if not ok:
+            logging.warning("Could not add model %s to collection %s: %s", model.uid, collection.uid, await r.text())
+        return ok
+
+    async def remove_model(self, collection: SFCollection, model: SFModel) -> bool:
+        """Remove a model from a collection"""
+        r = await self._request(
+            'DELETE',
+            f'{self.api_url}/collections/{collection.uid}/models',
+            json={'models': [model.uid]},
+        )
+        ok = r.status == 204
+        if not ok:
+            logging.warning(
+                "Could not remove model %s from collection %s: %s", model.uid, collection.uid, await r.text()
+            )
+        return ok
@@ -2,19 +2,34 @@
 Sketchfab API
 """
 import datetime
+import fnmatch
+import hashlib
 import json
 import logging
 import os
+import re
 import tempfile
+import threading
+import time
 import zipfile
-from typing import List, Dict, Union, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait as wait_futures
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Dict, Tuple, Union, Optional
 
 import requests
 
-from sketchfab.models import SFModel, SFCollection
+from sketchfab.dedup import SFUploadIndex
+from sketchfab.jsonstream import SFResultsStream
+from sketchfab.metrics import call_hooks
+from sketchfab.models import SFModel, SFCollection, project
+from sketchfab.multipart import MultipartEncoder, UploadProgress, UploadSource
+from sketchfab.pager import STREAM_CHUNK_SIZE, SFPager
+from sketchfab.rangefile import HTTPRangeFile
 
 API_URL = 'https://api.sketchfab.com/v3'
 
+DownloadProgress = Callable[[SFModel, int, Optional[int]], None]
+"""Download progress callback, called with the model, the downloaded and the total (if known) number of bytes"""
+
 
 class SFModelsApi:
     """Models management API"""
@@ -26,7 +41,7 @@ class SFModelsApi:
         ([API doc](https://docs.sketchfab.com/data-api/v3/index.html#!/comments/post_v3_comments))
         """
         r = clt.session.post(
-            f'{API_URL}/comments',
+            f'{clt.api_url}/comments',
             data={'model': model.uid, 'body': msg},
         )
         r.raise_for_status()
@@ -42,9 +57,12 @@ class SFModelsApi:
 
     @staticmethod
     def _prepare_update_data(model: SFModel) -> Dict[str, Union[str, bool]]:
+        return SFModelsApi._encode_update_data(model.changes())
+
+    @staticmethod
+    def _encode_update_data(changes: Dict[str, Any]) -> Dict[str, Union[str, bool]]:
         data = {}
-        for prop_name in model.modified:
-            value = model.json[prop_name]
+        for prop_name, value in changes.items():
             if prop_name in SFModelsApi.UPDATABLE_PROPERTIES:
                 data[prop_name] = value
             elif prop_name in SFModelsApi.UPDATABLE_PROPERTIES_JSON:
@@ -52,30 +70,117 @@ class SFModelsApi:
             # Some more specific logic might appear later
         return data
 
+    @staticmethod
+    def _patch_model(clt: 'SketchFabClient', uid: str, data: Dict[str, Union[str, bool]]) -> bool:
+        if not data:
+            return True
+        r = clt.session.patch(
+            f'{clt.api_url}/models/{uid}',
+            data=data,
+        )
+        if clt.cache:
+            clt.cache.invalidate(uid)
+        ok = r.status_code == 204
+        if not ok:
+            logging.warning("Could not update model %s: %s", uid, r.content)
+        return ok
+
     @staticmethod
     def update_model(
             clt: 'SketchFabClient',
             model: SFModel,
     ) -> bool:
-
-        data = SFModelsApi._prepare_update_data(model)
-
-        r = clt.session.patch(
-            f'{API_URL}/models/{model.uid}',
-            data=data,
-        )
+        """Update the modified properties of a model, nothing is sent if their values didn't change"""
+        ok = SFModelsApi._patch_model(clt, model.uid, SFModelsApi._prepare_update_data(model))
         model.modified = []
-        ok = r.status_code == 204
         return ok
 
     @staticmethod
-    def get_model(clt: 'SketchFabClient', uid: str) -> Optional[SFModel]:
+    def bulk_update(
+            clt: 'SketchFabClient',
+            models: Iterable[SFModel],
+            workers: int = 8,
+    ) -> Dict[str, bool]:
+        """
+        Update many models in parallel.
+
+        The changes of the models sharing the same uid are merged (the last one wins) into a single request, and
+        models without any actual change are skipped.
+
+        :param clt: Client
+        :param models: Models to update
+        :param workers: Number of parallel requests (they still obey the rate limit of the client)
+        :return: If each model could be updated, by uid (the models which couldn't keep their modifications)
+        """
+        changes: Dict[str, Dict[str, Any]] = {}
+        by_uid: Dict[str, List[SFModel]] = {}
+        for m in models:
+            changes.setdefault(m.uid, {}).update(m.changes())
+            by_uid.setdefault(m.uid, []).append(m)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(SFModelsApi._patch_model, clt, uid, SFModelsApi._encode_update_data(c)): uid
+                for uid, c in changes.items()
+            }
+            for future in as_completed(futures):
+                uid = futures[future]
+                try:
+                    results[uid] = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    logging.warning("Could not update model %s: %s", uid, e)
+                    results[uid] = False
+
+        for uid, ok in results.items():
+            if ok:
+                for m in by_uid[uid]:
+                    m.modified = []
+        return results
+
+    @staticmethod
+    def get_model(clt: 'SketchFabClient', uid: str, use_cache: bool = True) -> Optional[SFModel]:
+        """
+        Get a model, concurrent calls for the same uid share a single request
+        :param clt: Client
+        :param uid: UID of the model
+        :param use_cache: Use the cached model and the requests in flight, disable it to get the current state of a
+        model which changes on its own (like its processing status). The cache is updated in both cases.
+        """
+        if use_cache:
+            content = clt.inflight.do(('model', uid), lambda: SFModelsApi._fetch_model(clt, uid))
+        else:
+            content = SFModelsApi._fetch_model(clt, uid, use_cache=False)
+        return SFModel(content, clt) if content is not None else None
+
+    @staticmethod
+    def _fetch_model(clt: 'SketchFabClient', uid: str, use_cache: bool = True) -> Optional[bytes]:
+        cache = clt.cache
+        entry = cache.get(uid) if cache and use_cache else None
+        headers = {}
+        if entry:
+            if cache.is_fresh(entry):
+                cache.record('hits')
+                return entry.content
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
         r = clt.session.get(
-            f'{API_URL}/models/{uid}'
+            f'{clt.api_url}/models/{uid}',
+            headers=headers,
         )
+        if r.status_code == requests.codes.not_modified and entry:
+            cache.record('revalidations')
+            cache.touch(uid)
+            return entry.content
+        if cache and use_cache:
+            cache.record('misses')
         if r.status_code == 200:
-            j = json.loads(r.content)
-            return SFModel(j, clt)
+            if cache:
+                cache.put(uid, r.content, r.headers.get('etag'), r.headers.get('last-modified'))
+            return r.content
         else:
             return None
 
@@ -99,32 +204,93 @@ class SFModelsApi:
             params['published_since'] = published_since.strftime("%Y-%m-%d")
         return params
 
+    @staticmethod
+    def _list_page(
+            clt: 'SketchFabClient',
+            url: str,
+            factory: Callable[[Dict[str, Any], 'SketchFabClient'], Any],
+            fields: Optional[Iterable[str]],
+            stream: bool,
+    ) -> Iterator[Any]:
+        """Items of a listing page, decoded while it is received with `stream`"""
+        if not stream:
+            r = clt.session.get(url)
+            r.raise_for_status()
+            for item in r.json()['results']:
+                yield factory(project(item, fields) if fields is not None else item, clt)
+            return
+        with clt.session.get(url, stream=True) as r:
+            r.raise_for_status()
+            for item in SFResultsStream(r.iter_content(STREAM_CHUNK_SIZE), fields=fields):
+                yield factory(item, clt)
+
     @staticmethod
     def list_public(
             clt: 'SketchFabClient',
             sort_by: str = None,
             downloadable: bool = None,
-            published_since: datetime.datetime = None
+            published_since: datetime.datetime = None,
+            fields: Iterable[str] = None,
+            stream: bool = False,
     ) -> List[SFModel]:
+        """
+        List the first page of the public models
+        :param fields: Only keep these fields of each model
+        :param stream: Decode the models while the response is received (see `SFResultsStream`)
+        """
         params = SFModelsApi._list_prepare_params_common(
             downloadable=downloadable,
             sort_by=sort_by,
             published_since=published_since,
         )
         req = requests.PreparedRequest()
-        req.prepare_url(f'{API_URL}/search', params)
-        r = clt.session.get(req.url)
-        r.raise_for_status()
-        data = r.json()
-        return [SFModel(m, clt) for m in data['results']]
+        req.prepare_url(f'{clt.api_url}/search', params)
+        return list(SFModelsApi._list_page(clt, req.url, SFModel, fields, stream))
+
+    @staticmethod
+    def iter_public(
+            clt: 'SketchFabClient',
+            sort_by: str = None,
+            downloadable: bool = None,
+            published_since: datetime.datetime = None,
+            count: int = 24,
+            cursor: str = None,
+            prefetch: bool = False,
+            fields: Iterable[str] = None,
+            stream: bool = False,
+            offset: int = 0,
+    ) -> SFPager[SFModel]:
+        """
+        Iterate over all the public models, following the listing cursor
+        :param count: Number of models fetched per page
+        :param cursor: Cursor to resume the listing from (see `SFPager.cursor`)
+        :param offset: Number of items of the cursor page to skip (see `SFPager.offset`)
+        :param prefetch: Fetch the next page in the background while the current one is consumed
+        :param fields: Only keep these fields of each item (like `['uid', 'name', 'updatedAt']`) to save memory
+        :param stream: Decode the items while each page is received, instead of loading whole pages
+        """
+        params = SFModelsApi._list_prepare_params_common(
+            downloadable=downloadable,
+            sort_by=sort_by,
+            published_since=published_since,
+        )
+        return SFPager(clt, f'{clt.api_url}/search', params, SFModel, count=count, cursor=cursor, prefetch=prefetch,
+                       fields=fields, stream=stream, offset=offset)
 
     @staticmethod
     def list_mines(
             clt: 'SketchFabClient',
             sort_by: str = None,
             downloadable: bool = None,
-            collection: SFCollection = None
+            collection: SFCollection = None,
+            fields: Iterable[str] = None,
+            stream: bool = False,
     ) -> List[SFModel]:
+        """
+        List the first page of your models
+        :param fields: Only keep these fields of each model
+        :param stream: Decode the models while the response is received (see `SFResultsStream`)
+        """
 
         # Using a prepared request is the simplest way to build an URL
         params = SFModelsApi._list_prepare_params_common(
@@ -133,92 +299,772 @@ class SFModelsApi:
             collection=collection,
         )
         req = requests.PreparedRequest()
-        req.prepare_url(f'{API_URL}/me/search', params)
-        r = clt.session.get(req.url)
-        r.raise_for_status()
-        data = r.json()
-        return [SFModel(m, clt) for m in data['results']]
+        req.prepare_url(f'{clt.api_url}/me/search', params)
+        return list(SFModelsApi._list_page(clt, req.url, SFModel, fields, stream))
+
+    @staticmethod
+    def iter_mines(
+            clt: 'SketchFabClient',
+            sort_by: str = None,
+            downloadable: bool = None,
+            collection: SFCollection = None,
+            count: int = 24,
+            cursor: str = None,
+            prefetch: bool = False,
+            fields: Iterable[str] = None,
+            stream: bool = False,
+            offset: int = 0,
+    ) -> SFPager[SFModel]:
+        """
+        Iterate over all your models, following the listing cursor
+        :param count: Number of models fetched per page
+        :param cursor: Cursor to resume the listing from (see `SFPager.cursor`)
+        :param offset: Number of items of the cursor page to skip (see `SFPager.offset`)
+        :param prefetch: Fetch the next page in the background while the current one is consumed
+        :param fields: Only keep these fields of each item (like `['uid', 'name', 'updatedAt']`) to save memory
+        :param stream: Decode the items while each page is received, instead of loading whole pages
+        """
+        params = SFModelsApi._list_prepare_params_common(
+            sort_by=sort_by,
+            downloadable=downloadable,
+            collection=collection,
+        )
+        return SFPager(clt, f'{clt.api_url}/me/search', params, SFModel, count=count, cursor=cursor, prefetch=prefetch,
+                       fields=fields, stream=stream, offset=offset)
 
     @staticmethod
     def upload_model(
             clt: 'SketchFabClient',
-            file_path: str,
-            model: SFModel = None
+            file_path: UploadSource,
+            model: SFModel = None,
+            progress: UploadProgress = None,
+            filename: str = None,
+            chunk_size: int = 1 << 20,
+            dedup: bool = True,
     ) -> Optional[SFModel]:
         """
         https://docs.sketchfab.com/data-api/v3/index.html#!/models/post_v3_models
+
+        The request body is streamed: the file is read `chunk_size` bytes at a time while it is sent.
+
+        When the client has an upload index (see `sketchfab.dedup.SFUploadIndex`), a file whose content was already
+        uploaded isn't uploaded again: the existing model is returned, after its metadata was updated from `model`.
+
         :param clt: Client
-        :param file_path: File to upload
+        :param file_path: File to upload: a path, a binary file object or an iterator of bytes (like an archive being
+        built on the fly)
         :param model: Optional model description
+        :param progress: Called with the sent and total (if known) number of bytes and the throughput in B/s
+        :param filename: Name of the uploaded file, mandatory for an iterator of bytes. Sketchfab relies on its
+        extension to detect the file format.
+        :param chunk_size: Size of the chunks read from the file
+        :param dedup: Use the upload index of the client, if any
         :return: The model
         """
         if not model:
             model = SFModel()
 
-        params = SFModelsApi._prepare_update_data(model)
+        index = clt.upload_index if dedup else None
+        digest = index.hash_source(file_path, chunk_size) if index else None
+        if digest:
+            uid = SFModelsApi._find_upload(clt, index, digest)
+            if index.remote_tags and (uid is None or 'tags' in model.modified):
+                model.tags = index.with_tag(model.tags, digest)
+            if uid:
+                logging.info("Content already uploaded as model %s, only updating its metadata", uid)
+                model.json['uid'] = uid
+                return model if SFModelsApi.update_model(clt, model) else None
+
+        params = {k: str(v) for k, v in SFModelsApi._prepare_update_data(model).items()}
+        last_sent = [0]
+
+        def on_progress(sent: int, total: Optional[int], throughput: float):
+            # Rewinding the body for a retry restarts the count
+            call_hooks(clt.hooks, 'on_upload_chunk', sent - last_sent[0] if sent > last_sent[0] else sent)
+            last_sent[0] = sent
+            if progress:
+                progress(sent, total, throughput)
+
+        body = MultipartEncoder(params, 'modelFile', file_path, filename=filename, chunk_size=chunk_size,
+                                progress=on_progress)
+        r = clt.session.post(
+            f'{clt.api_url}/models',
+            data=body,
+            headers={'Content-Type': body.content_type},
+        )
+        r.raise_for_status()
+        if r.status_code == 201:
+            j = json.loads(r.content)
+            model.json['uid'] = j['uid']
+            model.modified = []
+            if clt.cache:
+                clt.cache.invalidate(model.uid)
+            if digest:
+                index.put(digest, model.uid)
+            return model
+        return None
 
-        with open(file_path, 'rb') as f:
-            r = clt.session.post(
-                f'{API_URL}/models',
-                data=params,
-                files={'modelFile': f}
+    @staticmethod
+    def _find_upload(clt: 'SketchFabClient', index: SFUploadIndex, digest: str) -> Optional[str]:
+        """Find the model uploaded from a file, in the index or (with `remote_tags`) by its tag"""
+        uid = index.get(digest)
+        if uid:
+            if SFModelsApi.get_model(clt, uid):
+                return uid
+            # The model was deleted
+            index.discard(digest)
+        if index.remote_tags:
+            r = clt.session.get(
+                f'{clt.api_url}/me/search',
+                params={'type': 'models', 'tags': index.tag(digest), 'count': 1},
             )
             r.raise_for_status()
-            if r.status_code == 201:
-                j = json.loads(r.content)
-                model.json['uid'] = j['uid']
-                model.modified = []
-                return model
-            return None
+            results = r.json().get('results')
+            if results:
+                uid = results[0]['uid']
+                index.put(digest, uid)
+                return uid
+        return None
+
+    @staticmethod
+    def upload_many(
+            clt: 'SketchFabClient',
+            paths: Iterable[str],
+            metadata: Union[Dict[str, SFModel], Callable[[str], SFModel]] = None,
+            workers: int = 4,
+            wait: bool = True,
+            **wait_kwargs
+    ) -> Iterator[Tuple[str, Optional[SFModel]]]:
+        """
+        Upload many files in parallel and wait for Sketchfab to process them.
+
+        :param clt: Client
+        :param paths: Files to upload
+        :param metadata: Description of the model of each file, either by path or as a function of the path
+        :param workers: Number of parallel uploads
+        :param wait: Wait for the models to be processed (see `wait_for_processing` for the other arguments)
+        :return: The path and the model of each file, as soon as its model is processed (or, without `wait`,
+        uploaded). The model is `None` if the upload failed, otherwise its `processing_status` tells if the
+        processing succeeded.
+        """
+        def upload(path: str) -> Optional[SFModel]:
+            if metadata is None:
+                model = None
+            elif callable(metadata):
+                model = metadata(path)
+            else:
+                model = metadata.get(path)
+            return SFModelsApi.upload_model(clt, path, model)
+
+        watcher = SFProcessingWatcher(clt, **wait_kwargs)
+        uploaded: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(upload, path): path for path in paths}
+            # The processing of the uploaded models is watched while the other files are being uploaded
+            while futures or watcher.pending:
+                delay = watcher.delay()
+                if futures:
+                    done, _ = wait_futures(futures, timeout=delay, return_when=FIRST_COMPLETED)
+                else:
+                    done = set()
+                    time.sleep(delay)
+                for future in done:
+                    path = futures.pop(future)
+                    try:
+                        model = future.result()
+                    except Exception as e:  # pylint: disable=broad-except
+                        logging.warning("Could not upload %s: %s", path, e)
+                        model = None
+                    if model is None or not wait:
+                        yield path, model
+                    else:
+                        uploaded[model.uid] = path
+                        watcher.add(model)
+                if watcher.delay() == 0:
+                    for model in watcher.poll():
+                        yield uploaded.pop(model.uid), model
+
+    PROCESSING_DONE: List[str] = ['SUCCEEDED', 'FAILED']
 
     @staticmethod
-    def download(clt: 'SketchFabClient', model: SFModel) -> str:
-        data = clt.session.get(f'{API_URL}/models/{model.uid}/download').json()
-        url_download = data['gltf']['url']
-        with requests.get(url_download, stream=True) as r:
+    def wait_for_processing(
+            clt: 'SketchFabClient',
+            models: Iterable[SFModel],
+            min_interval: float = 2,
+            max_interval: float = 60,
+            timeout: float = None,
+    ) -> Iterator[SFModel]:
+        """
+        Wait for many models to be processed by Sketchfab, polling their statuses with a single listing of your
+        models per round (see `SFProcessingWatcher`).
+
+        :param clt: Client
+        :param models: Models to wait for
+        :param min_interval: Minimum interval between two polling rounds (in seconds)
+        :param max_interval: Maximum interval between two polling rounds (in seconds)
+        :param timeout: Maximum time to wait (in seconds), a `TimeoutError` is raised when it is exceeded
+        :return: Up-to-date models, as soon as their processing succeeded or failed
+        """
+        watcher = SFProcessingWatcher(clt, min_interval=min_interval, max_interval=max_interval, timeout=timeout)
+        for model in models:
+            watcher.add(model)
+        while watcher.pending:
+            time.sleep(watcher.delay())
+            yield from watcher.poll()
+
+    @staticmethod
+    def _download_meta(path: str) -> Dict[str, Any]:
+        try:
+            with open(f'{path}.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_download_meta(path: str, meta: Dict[str, Any]):
+        with open(f'{path}.json', 'w') as f:
+            json.dump(meta, f)
+
+    @staticmethod
+    def _download_info(clt: 'SketchFabClient', model: SFModel, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Get the temporary download URL (and size) of the glTF archive of a model. It is reused until it expires, and
+        concurrent calls for the same model share a single request.
+        :param refresh: Request a new URL, when the cached one was refused
+        """
+        if refresh:
+            clt.download_urls.invalidate(model.uid)
+        else:
+            info = clt.download_urls.get(model.uid)
+            if info:
+                return info
+        return clt.inflight.do(('download_info', model.uid), lambda: SFModelsApi._fetch_download_info(clt, model.uid))
+
+    @staticmethod
+    def _fetch_download_info(clt: 'SketchFabClient', uid: str) -> Dict[str, Any]:
+        r = clt.session.get(f'{clt.api_url}/models/{uid}/download')
+        r.raise_for_status()
+        info = r.json()['gltf']
+        clt.download_urls.put(uid, info)
+        return info
+
+    @staticmethod
+    def download(
+            clt: 'SketchFabClient',
+            model: SFModel,
+            dest_dir: str = None,
+            progress: DownloadProgress = None,
+            skip_unchanged: bool = True,
+            attempts: int = 3,
+    ) -> str:
+        """
+        Download a model as a ZIP file.
+
+        The archive is first written to a `.part` file. An interrupted download is resumed from there (with an HTTP
+        `Range` request) on the next attempt or the next call. The size and, when the server provides it, the MD5
+        checksum are verified once the download completes. A `.json` sidecar file records the `updatedAt` of the
+        downloaded model, so that unchanged models aren't downloaded again.
+
+        Concurrent downloads of the same model to the same place share a single download.
+
+        :param clt: Client
+        :param model: Model to download
+        :param dest_dir: Directory to write the `<uid>.zip` file in. If not specified, a new temporary file is created,
+        so downloads are only resumed and skipped when unchanged with a `dest_dir`
+        :param progress: Called with the model, the downloaded and the total (if known) number of bytes
+        :param skip_unchanged: Don't download the model again if it was already downloaded and hasn't changed since
+        :param attempts: Number of attempts of an interrupted download before giving up
+        :return: Path of the created file
+        """
+        if attempts < 1:
+            raise ValueError(f"At least one attempt is needed, got {attempts}")
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+            path = os.path.join(dest_dir, f'{model.uid}.zip')
+        else:
+            fd, path = tempfile.mkstemp(prefix='sketchfab_', suffix=f'_{model.uid}.zip')
+            os.close(fd)
+        return clt.inflight.do(
+            ('download', path),
+            lambda: SFModelsApi._download(clt, model, path, progress, skip_unchanged, attempts, bool(dest_dir)),
+        )
+
+    @staticmethod
+    def _download(
+            clt: 'SketchFabClient',
+            model: SFModel,
+            path: str,
+            progress: Optional[DownloadProgress],
+            skip_unchanged: bool,
+            attempts: int,
+            keep_meta: bool,
+    ) -> str:
+        """Download a model to `path`, with `keep_meta` its `.json` sidecar records it to resume or skip it later"""
+        part_path = f'{path}.part'
+        meta = SFModelsApi._download_meta(path) if keep_meta else {}
+        updated_at = model.updated_at
+
+        if meta.get('uid') != model.uid or meta.get('updatedAt') != updated_at:
+            # Whatever we have belongs to another version of the model
+            for p in path, part_path:
+                if os.path.exists(p):
+                    os.remove(p)
+            meta = {'uid': model.uid, 'updatedAt': updated_at, 'complete': False}
+        elif skip_unchanged and updated_at and meta.get('complete') and os.path.isfile(path) \
+                and os.path.getsize(path) == meta.get('size'):
+            logging.info("Model %s is unchanged, skipping download", model.uid)
+            return path
+
+        gltf = SFModelsApi._download_info(clt, model)
+        url_download = gltf['url']
+        expected_size = gltf.get('size')
+
+        meta['complete'] = False
+        if keep_meta:
+            SFModelsApi._write_download_meta(path, meta)
+
+        for attempt in range(attempts):
+            try:
+                size, md5 = SFModelsApi._download_part(clt, model, url_download, part_path, progress)
+                break
+            except requests.HTTPError as e:
+                if e.response.status_code != requests.codes.forbidden or attempt + 1 == attempts:
+                    raise
+                logging.info("Download URL of model %s expired, requesting a new one", model.uid)
+                url_download = SFModelsApi._download_info(clt, model, refresh=True)['url']
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt + 1 == attempts:
+                    raise
+                logging.warning("Download of model %s interrupted (%s), resuming", model.uid, e)
+
+        if expected_size is not None and size != expected_size:
+            os.remove(part_path)
+            raise IOError(f"Downloaded {size} bytes for model {model.uid} instead of {expected_size}")
+        if md5 and md5 != SFModelsApi._file_md5(part_path):
+            os.remove(part_path)
+            raise IOError(f"Checksum mismatch for the download of model {model.uid}")
+
+        os.replace(part_path, path)
+        if keep_meta:
+            meta.update(complete=True, size=size)
+            SFModelsApi._write_download_meta(path, meta)
+        return path
+
+    @staticmethod
+    def _file_md5(path: str) -> str:
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    @staticmethod
+    def _download_part(
+            clt: 'SketchFabClient',
+            model: SFModel,
+            url: str,
+            part_path: str,
+            progress: Optional[DownloadProgress],
+    ) -> Tuple[int, Optional[str]]:
+        """
+        Download (or resume downloading) a file to `part_path`
+        :return: Total size of the file and its MD5 checksum if the server gave it
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with clt.download_session.get(url, stream=True, headers=headers) as r:
+            if r.status_code == requests.codes.requested_range_not_satisfiable:
+                # The part file is already complete
+                total = int(r.headers.get('content-range', '*/-1').rsplit('/', 1)[-1])
+                if total == offset:
+                    return offset, SFModelsApi._etag_md5(r)
+                os.remove(part_path)
+                return SFModelsApi._download_part(clt, model, url, part_path, progress)
             r.raise_for_status()
-            suffix = f'_{model.uid}'
-            if r.headers.get('content-type') == 'application/zip':
-                suffix += '.zip'
-            _, path = tempfile.mkstemp(prefix='sketchfab_', suffix=suffix)
-            with open(path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
+            if r.status_code != requests.codes.partial_content:
+                offset = 0
+            if 'content-length' in r.headers:
+                total = offset + int(r.headers['content-length'])
+            else:
+                total = None
+            done = offset
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                for chunk in r.iter_content(chunk_size=65536):
                     if chunk:  # filter out keep-alive new chunks
                         f.write(chunk)
-            return path
+                        done += len(chunk)
+                        call_hooks(clt.hooks, 'on_download_chunk', model.uid, len(chunk))
+                        if progress:
+                            progress(model, done, total)
+            return done, SFModelsApi._etag_md5(r)
+
+    @staticmethod
+    def _etag_md5(r: requests.Response) -> Optional[str]:
+        # S3 ETags are the MD5 of the file, except for multipart uploads ("<md5>-<parts>")
+        etag = r.headers.get('etag', '').strip('"')
+        if re.fullmatch(r'[0-9a-f]{32}', etag):
+            return etag
+        return None
 
     @staticmethod
-    def download_to_dir(clt: 'SketchFabClient', model: SFModel) -> str:
-        zf = SFModelsApi.download(clt, model)
-        with zipfile.ZipFile(zf, 'r') as zip_ref:
+    def download_many(
+            clt: 'SketchFabClient',
+            models: Iterable[SFModel],
+            dest_dir: str,
+            workers: int = 4,
+            progress: DownloadProgress = None,
+            on_error: Callable[[SFModel, Exception], None] = None,
+    ) -> Dict[str, str]:
+        """
+        Download many models in parallel, each of them as a `<uid>.zip` file in `dest_dir`.
+
+        A failing download doesn't stop the others, it is logged and reported to `on_error`.
+
+        :param clt: Client
+        :param models: Models to download
+        :param dest_dir: Directory to download the models to
+        :param workers: Number of parallel downloads, should not exceed the connection pool sizes of the client
+        :param progress: Called with the model, the downloaded and the total (if known) number of bytes
+        :param on_error: Called with the model and the exception of each failed download
+        :return: Path of the downloaded file of each successfully downloaded model, by uid
+        """
+        if workers > min(clt.pool_size, clt.download_pool_size) and not clt.pool_block:
+            logging.warning(
+                "%d parallel downloads for pools of %d/%d connections, connections won't be reused",
+                workers, clt.pool_size, clt.download_pool_size,
+            )
+        paths = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(SFModelsApi.download, clt, m, dest_dir=dest_dir, progress=progress): m
+                for m in models
+            }
+            for future in as_completed(futures):
+                model = futures[future]
+                try:
+                    paths[model.uid] = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    logging.warning("Could not download model %s: %s", model.uid, e)
+                    if on_error:
+                        on_error(model, e)
+        return paths
+
+    @staticmethod
+    def download_to_dir(
+            clt: 'SketchFabClient',
+            model: SFModel,
+            dest_dir: str = None,
+            members: Union[Iterable[str], Callable[[str], bool]] = None,
+            stream: bool = True,
+            spool_size: int = 64 << 20,
+    ) -> str:
+        """
+        Download a model and extract its archive to a directory.
+
+        In streaming mode the archive is never written to the disk: its index is read with range requests and only
+        the extracted members are fetched. If the server doesn't support range requests, the archive is spooled
+        in memory (up to `spool_size`, then on the disk) instead.
+
+        :param clt: Client
+        :param model: Model to download
+        :param dest_dir: Directory to extract the archive to, a temporary directory is created if not specified
+        :param members: Members to extract, either a list of names or glob patterns (like
+        `['scene.gltf', 'scene.bin']`) or a function returning if a name should be extracted. Everything is
+        extracted if not specified.
+        :param stream: Extract without downloading the archive first
+        :param spool_size: Maximum size of the in-memory spool
+        :return: Path of the directory
+        """
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+            path = dest_dir
+        else:
             path = tempfile.mkdtemp(prefix='sketchfab_', suffix=f'_{model.uid}')
-            zip_ref.extractall(path)
-        os.remove(zf)
+
+        if members is not None and not callable(members):
+            patterns = list(members)
+            members = lambda name: any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+        if not stream:
+            zf = SFModelsApi.download(clt, model)
+            SFModelsApi._extract(zf, path, members)
+            os.remove(zf)
+            return path
+
+        url_download = SFModelsApi._download_info(clt, model)['url']
+        for attempt in range(2):
+            try:
+                SFModelsApi._extract_remote(clt, model, url_download, path, members, spool_size)
+                return path
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != requests.codes.forbidden or attempt:
+                    raise
+                logging.info("Download URL of model %s expired, requesting a new one", model.uid)
+                url_download = SFModelsApi._download_info(clt, model, refresh=True)['url']
         return path
 
+    @staticmethod
+    def _extract_remote(
+            clt: 'SketchFabClient',
+            model: SFModel,
+            url_download: str,
+            path: str,
+            members: Optional[Callable[[str], bool]],
+            spool_size: int,
+    ):
+        f = HTTPRangeFile.open(clt.download_session, url_download, hooks=clt.hooks, uid=model.uid)
+        if f is None:
+            logging.info("Range requests unsupported for model %s, spooling the archive", model.uid)
+            f = tempfile.SpooledTemporaryFile(max_size=spool_size)
+            with clt.download_session.get(url_download, stream=True) as r:
+                r.raise_for_status()
+                for chunk in r.iter_content(chunk_size=65536):
+                    f.write(chunk)
+                    call_hooks(clt.hooks, 'on_download_chunk', model.uid, len(chunk))
+            f.seek(0)
+        with f:
+            SFModelsApi._extract(f, path, members)
+
+    @staticmethod
+    def _extract(f: Union[str, BinaryIO], path: str, members: Optional[Callable[[str], bool]]):
+        with zipfile.ZipFile(f, 'r') as zip_ref:
+            if members is None:
+                zip_ref.extractall(path)
+            else:
+                zip_ref.extractall(path, [name for name in zip_ref.namelist() if members(name)])
+
+
+class SFProcessingWatcher:
+    """
+    Watches the processing of uploaded models. Each polling round lists your models, most recently created first,
+    until all the watched ones are found or the listing reaches models created before them, so that many models only
+    cost a few requests per round whatever their number. The watched models missing from the listing (not indexed
+    yet) are fetched on their own, and the ones which disappeared (deleted) are given up with a warning: they are
+    returned without any `processing_status`.
+
+    Models can be added while others are being watched, from any thread, and several threads can `wait` for their
+    own models while sharing the polling rounds.
+
+    The interval between two rounds doubles (up to `max_interval`) as long as nothing changes and goes back to
+    `min_interval` when some models are done.
+    """
+
+    CLOCK_SKEW = datetime.timedelta(minutes=5)
+    """Margin on the creation date of the models added without it, estimated with the local clock"""
+
+    def __init__(self, clt: 'SketchFabClient', min_interval: float = 2, max_interval: float = 60, timeout: float = None):
+        """
+        :param clt: Client
+        :param min_interval: Minimum interval between two polling rounds (in seconds)
+        :param max_interval: Maximum interval between two polling rounds (in seconds)
+        :param timeout: Maximum time to wait for each model (in seconds), a `TimeoutError` is raised when it is
+        exceeded
+        """
+        self.clt = clt
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.pending: Dict[str, Optional[float]] = {}
+        """Deadline of each watched model, by uid"""
+        self._created: Dict[str, str] = {}
+        """Creation date of each watched model (or a date before it), by uid"""
+        self._interval = min_interval
+        self._next_poll: Optional[float] = None
+        self._polling = False
+        """If a thread waiting with `wait` is polling"""
+        self._done: Dict[str, SFModel] = {}
+        """Models done, until the thread waiting for them picks them up"""
+        self._cond = threading.Condition()
+
+    def add(self, model: SFModel):
+        """Watch a model"""
+        now = time.monotonic()
+        with self._cond:
+            self.pending[model.uid] = now + self.timeout if self.timeout is not None else None
+            created_at = model.json.get('createdAt')
+            if not created_at:
+                created_at = (datetime.datetime.utcnow() - self.CLOCK_SKEW).isoformat(timespec='seconds')
+            self._created[model.uid] = created_at
+            if self._next_poll is None:
+                self._interval = self.min_interval
+                self._next_poll = now + self.min_interval
+
+    def delay(self) -> Optional[float]:
+        """Time to wait before the next round, `None` if no model is watched"""
+        with self._cond:
+            return self._delay()
+
+    def _delay(self) -> Optional[float]:
+        if self._next_poll is None:
+            return None
+        return max(self._next_poll - time.monotonic(), 0)
+
+    def wait(self, model: SFModel) -> SFModel:
+        """
+        Watch a model and wait for its processing. The threads waiting for their models take turns to poll.
+        :return: Up-to-date model, once its processing succeeded or failed
+        """
+        self.add(model)
+        while True:
+            with self._cond:
+                while True:
+                    if model.uid in self._done:
+                        return self._done.pop(model.uid)
+                    deadline = self.pending.get(model.uid)
+                    if deadline is not None and deadline < time.monotonic():
+                        del self.pending[model.uid]
+                        del self._created[model.uid]
+                        raise TimeoutError(f"Model still processing: {model.uid}")
+                    delay = None if self._polling else self._delay()
+                    if delay == 0:
+                        self._polling = True
+                        break
+                    self._cond.wait(delay)
+            # The threads waiting for the expired models raise the timeout themselves
+            done = []
+            try:
+                done, _ = self._poll()
+            finally:
+                with self._cond:
+                    self._polling = False
+                    self._done.update((m.uid, m) for m in done)
+                    self._cond.notify_all()
+
+    def poll(self) -> List[SFModel]:
+        """
+        Poll the statuses of the watched models
+        :return: Up-to-date models whose processing succeeded or failed (or which disappeared) since the previous
+        round
+        """
+        done, expired = self._poll()
+        if expired:
+            raise TimeoutError(f"Models still processing: {', '.join(expired)}")
+        return done
+
+    def _poll(self) -> Tuple[List[SFModel], List[str]]:
+        """Models done, and uids of the models which won't be done before their deadline"""
+        with self._cond:
+            remaining = set(self.pending)
+            oldest = min(self._created[uid] for uid in remaining) if remaining else None
+        done = []
+        if remaining:
+            for model in SFPager(self.clt, f'{self.clt.api_url}/me/models', {'sort_by': '-createdAt'}, SFModel):
+                created_at = model.json.get('createdAt')
+                if created_at and created_at < oldest:
+                    break
+                if model.uid not in remaining:
+                    continue
+                remaining.discard(model.uid)
+                if model.processing_status in SFModelsApi.PROCESSING_DONE:
+                    done.append(model)
+                if not remaining:
+                    break
+        for uid in remaining:
+            model = SFModelsApi.get_model(self.clt, uid, use_cache=False)
+            if model is None:
+                logging.warning("Model %s disappeared while being processed", uid)
+                done.append(SFModel({'uid': uid}, self.clt))
+            elif model.processing_status in SFModelsApi.PROCESSING_DONE:
+                done.append(model)
+
+        now = time.monotonic()
+        with self._cond:
+            for model in done:
+                self.pending.pop(model.uid, None)
+                self._created.pop(model.uid, None)
+                if self.clt.cache:
+                    self.clt.cache.invalidate(model.uid)
+            self._interval = self.min_interval if done else min(self._interval * 2, self.max_interval)
+            self._next_poll = now + self._interval if self.pending else None
+            expired = [uid for uid, deadline in self.pending.items()
+                       if deadline is not None and deadline < self._next_poll]
+        return done, expired
+
+
+class SFUpdateSession:
+    """
+    Collects modified models to update them all at once with `SFModelsApi.bulk_update`:
+    ```python
+    with clt.update_session() as session:
+        for m in clt.iter_models():
+            m.tags = m.tags + ['furniture']
+            session.add(m)
+    print(session.results)
+    ```
+    """
+
+    def __init__(self, clt: 'SketchFabClient', workers: int = 8):
+        self.clt = clt
+        self.workers = workers
+        self.models: List[SFModel] = []
+        self.results: Dict[str, bool] = {}
+        """If each model could be updated, by uid"""
+
+    def add(self, model: SFModel):
+        self.models.append(model)
+
+    def commit(self) -> Dict[str, bool]:
+        """Update the collected models"""
+        self.results.update(SFModelsApi.bulk_update(self.clt, self.models, workers=self.workers))
+        self.models = []
+        return self.results
+
+    def __enter__(self) -> 'SFUpdateSession':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+
 
 class SFCollectionsApi:
     """Collections management API"""
 
     @staticmethod
-    def list(clt: 'SketchFabClient') -> List[SFCollection]:
-        r = clt.session.get(f'{API_URL}/me/collections')
-        r.raise_for_status()
-        data = r.json()
-        return [SFCollection(m, clt) for m in data['results']]
+    def list(clt: 'SketchFabClient', fields: Iterable[str] = None, stream: bool = False) -> List[SFCollection]:
+        """
+        List the first page of your collections
+        :param fields: Only keep these fields of each collection
+        :param stream: Decode the collections while the response is received (see `SFResultsStream`)
+        """
+        return list(SFModelsApi._list_page(clt, f'{clt.api_url}/me/collections', SFCollection, fields, stream))
+
+    @staticmethod
+    def iter_collections(
+            clt: 'SketchFabClient',
+            count: int = 24,
+            cursor: str = None,
+            prefetch: bool = False,
+            fields: Iterable[str] = None,
+            stream: bool = False,
+            offset: int = 0,
+    ) -> SFPager[SFCollection]:
+        """
+        Iterate over all your collections, following the listing cursor
+        :param count: Number of collections fetched per page
+        :param cursor: Cursor to resume the listing from (see `SFPager.cursor`)
+        :param offset: Number of items of the cursor page to skip (see `SFPager.offset`)
+        :param prefetch: Fetch the next page in the background while the current one is consumed
+        :param fields: Only keep these fields of each item (like `['uid', 'name', 'updatedAt']`) to save memory
+        :param stream: Decode the items while each page is received, instead of loading whole pages
+        """
+        return SFPager(clt, f'{clt.api_url}/me/collections', {}, SFCollection, count=count, cursor=cursor,
+                       prefetch=prefetch, fields=fields, stream=stream, offset=offset)
 
     @staticmethod
     def create(clt, name: str, models: List[SFModel]) -> 'SFCollection':
         r = clt.session.post(
-            f'{API_URL}/collections',
+            f'{clt.api_url}/collections',
             json={
                 'name': name,
                 'models': [m.uid for m in models]
             },
         )
         r.raise_for_status()
-        r = requests.get(r.headers['Location'])
-        return SFCollection(r.json())
+        if 'Location' in r.headers:
+            r = clt.session.get(r.headers['Location'])
+            r.raise_for_status()
+        return SFCollection(r.json(), clt)
 
     UPDATABLE_PROPERTIES: List[str] = ['name']
 
@@ -227,7 +1073,7 @@ class SFCollectionsApi:
         data = {}
         for prop_name in collection.modified:
             value = collection.json[prop_name]
-            if prop_name in SFModelsApi.UPDATABLE_PROPERTIES:
+            if prop_name in SFCollectionsApi.UPDATABLE_PROPERTIES:
                 data[prop_name] = value
             # Some more specific logic might appear later
         return data
@@ -235,18 +1081,22 @@ class SFCollectionsApi:
     @staticmethod
     def update(clt, collection: SFCollection) -> bool:
         r = clt.session.patch(
-            f'{API_URL}/collections/{collection.uid}',
+            f'{clt.api_url}/collections/{collection.uid}',
             data=SFCollectionsApi._prepare_update_data(collection),
         )
-        ok = r.status_code / 100 == 2
-        if not ok:
+        ok = r.status_code // 100 == 2
+        if ok:
+            collection.modified = []
+            if clt:
+                clt.index_collection(collection)
+        else:
             logging.warning("Failed to update collection: %s", r.content)
         return ok
 
     @staticmethod
     def add_model(clt, collection: SFCollection, model: SFModel) -> bool:
         r = clt.session.post(
-            f'{API_URL}/collections/{collection.uid}/models',
+            f'{clt.api_url}/collections/{collection.uid}/models',
             json={'models': [model.uid]},
         )
         ok = r.status_code == requests.codes.created
@@ -259,7 +1109,7 @@ class SFCollectionsApi:
     @staticmethod
     def remove_model(clt, collection: SFCollection, model: SFModel) -> bool:
         r = clt.session.delete(
-            f'{API_URL}/collections/{collection.uid}/models',
+            f'{clt.api_url}/collections/{collection.uid}/models',
             json={'models': [model.uid]},
         )
         ok = r.status_code == 204
@@ -269,9 +1119,102 @@ class SFCollectionsApi:
 
         return ok
 
+    @staticmethod
+    def _change_models(clt, method: str, collection: SFCollection, uids: List[str]) -> Dict[str, bool]:
+        """
+        Add or remove models in a single request. If it's refused (with a 4xx status), the models are split in two
+        halves which are retried separately, to find which ones can't be added or removed. Server errors are not
+        retried this way, as they don't depend on the models (the session already retries them).
+        """
+        r = clt.session.request(
+            method,
+            f'{clt.api_url}/collections/{collection.uid}/models',
+            json={'models': uids},
+        )
+        expected = requests.codes.created if method == 'POST' else requests.codes.no_content
+        if r.status_code == expected:
+            return {uid: True for uid in uids}
+        if len(uids) == 1 or not 400 <= r.status_code < 500:
+            logging.warning("Could not %s models %s in collection %s: %s", method, ', '.join(uids), collection.uid,
+                            r.content)
+            return {uid: False for uid in uids}
+        middle = len(uids) // 2
+        results = SFCollectionsApi._change_models(clt, method, collection, uids[:middle])
+        results.update(SFCollectionsApi._change_models(clt, method, collection, uids[middle:]))
+        return results
+
+    @staticmethod
+    def _change_models_batch(
+            clt,
+            method: str,
+            collection: SFCollection,
+            models: Iterable[SFModel],
+            chunk_size: int,
+            workers: int,
+    ) -> Dict[str, bool]:
+        uids = list(dict.fromkeys(m.uid for m in models))
+        chunks = [uids[i:i + chunk_size] for i in range(0, len(uids), chunk_size)]
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk_results in executor.map(
+                    lambda chunk: SFCollectionsApi._change_models(clt, method, collection, chunk),
+                    chunks,
+            ):
+                results.update(chunk_results)
+        return results
+
+    @staticmethod
+    def add_models(
+            clt,
+            collection: SFCollection,
+            models: Iterable[SFModel],
+            chunk_size: int = 50,
+            workers: int = 4,
+    ) -> Dict[str, bool]:
+        """
+        Add many models to a collection, `chunk_size` models per request
+        :return: If each model could be added, by uid
+        """
+        return SFCollectionsApi._change_models_batch(clt, 'POST', collection, models, chunk_size, workers)
+
+    @staticmethod
+    def remove_models(
+            clt,
+            collection: SFCollection,
+            models: Iterable[SFModel],
+            chunk_size: int = 50,
+            workers: int = 4,
+    ) -> Dict[str, bool]:
+        """
+        Remove many models from a collection, `chunk_size` models per request
+        :return: If each model could be removed, by uid
+        """
+        return SFCollectionsApi._change_models_batch(clt, 'DELETE', collection, models, chunk_size, workers)
+
+    @staticmethod
+    def move_models(
+            clt,
+            src: SFCollection,
+            dst: SFCollection,
+            models: Iterable[SFModel],
+            chunk_size: int = 50,
+            workers: int = 4,
+    ) -> Dict[str, bool]:
+        """
+        Move many models from a collection to another one. Models are only removed from `src` once they have been
+        added to `dst`.
+        :return: If each model could be moved, by uid
+        """
+        models = list(models)
+        added = SFCollectionsApi.add_models(clt, dst, models, chunk_size, workers)
+        to_remove = [m for m in models if added[m.uid]]
+        results = {uid: False for uid in added}
+        results.update(SFCollectionsApi.remove_models(clt, src, to_remove, chunk_size, workers))
+        return results
+
     @staticmethod
     def list_models(clt: 'SketchFabClient', collection: SFCollection) -> List[SFModel]:
-        return SFModelsApi.list_mines(clt, collection=collection)
+        return list(SFModelsApi.iter_mines(clt, collection=collection))
 
     @staticmethod
     def list_models_broken(clt: 'SketchFabClient', collection: SFCollection) -> List[SFModel]:
@@ -282,6 +1225,6 @@ class SFCollectionsApi:
         :return: List of models
         """
         data = clt.session.get(
-            f'{API_URL}/collections/{collection.uid}/models',
+            f'{clt.api_url}/collections/{collection.uid}/models',
         ).json()
         return [SFModel(m, clt) for m in data['results']]
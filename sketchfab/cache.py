@@ -0,0 +1,198 @@
+"""
+Model metadata cache
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class SFCacheEntry(NamedTuple):
+    """Cached model"""
+    content: bytes
+    """JSON of the model, as returned by the API"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    """When the entry was fetched or last revalidated (`time.time()`)"""
+
+
+class SFModelCache:
+    """
+    Cache of the models fetched by `SFClient.get_model`, by uid.
+
+    Entries are kept in memory (the least recently used ones are evicted beyond `max_size`) and optionally in
+    a SQLite database so that they survive the process. Entries younger than `ttl` are used as is, older ones are
+    revalidated with a conditional request (`If-None-Match` / `If-Modified-Since`) when the API gave an `ETag` or
+    a `Last-Modified` header.
+
+    The cache is thread-safe and can be shared by several clients.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300, path: str = None):
+        """
+        :param max_size: Maximum number of models kept in memory
+        :param ttl: Time (in seconds) during which a cached model is used without asking the API
+        :param path: Path of a SQLite database to persist the cache to
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        """Number of lookups served from the cache, without any request"""
+        self.revalidations = 0
+        """Number of lookups served from the cache after a conditional request"""
+        self.misses = 0
+        """Number of lookups that required fetching the model"""
+        self._entries: 'OrderedDict[str, SFCacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS models ('
+                'uid TEXT PRIMARY KEY, content BLOB, etag TEXT, last_modified TEXT, fetched_at REAL)'
+            )
+
+    def get(self, uid: str) -> Optional[SFCacheEntry]:
+        """Get an entry, fresh or not"""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is not None:
+                self._entries.move_to_end(uid)
+                return entry
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                'SELECT content, etag, last_modified, fetched_at FROM models WHERE uid = ?', (uid,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = SFCacheEntry(*row)
+            self._store(uid, entry, persist=False)
+            return entry
+
+    def record(self, counter: str):
+        """Increment a counter: `hits`, `revalidations` or `misses`"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def is_fresh(self, entry: SFCacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(self, uid: str, content: bytes, etag: str = None, last_modified: str = None):
+        with self._lock:
+            self._store(uid, SFCacheEntry(content, etag, last_modified, time.time()))
+
+    def touch(self, uid: str):
+        """Mark an entry as fresh, after the API confirmed it didn't change"""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is not None:
+                self._store(uid, entry._replace(fetched_at=time.time()))
+
+    def _store(self, uid: str, entry: SFCacheEntry, persist: bool = True):
+        self._entries[uid] = entry
+        self._entries.move_to_end(uid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        if persist and self._db is not None:
+            self._db.execute(
+                'INSERT OR REPLACE INTO models (uid, content, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                (uid, entry.content, entry.etag, entry.last_modified, entry.fetched_at),
+            )
+
+    def invalidate(self, uid: str):
+        with self._lock:
+            self._entries.pop(uid, None)
+            if self._db is not None:
+                self._db.execute('DELETE FROM models WHERE uid = ?', (uid,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM models')
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, revalidation and miss counters"""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'revalidations': self.revalidations,
+            'misses': self.misses,
+        }
+
+
+class SFSingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call is in flight for a key, the other callers for the same key
+    wait for it and get its result (or its exception) instead of doing the same work again.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        """Number of calls which reused the result of another one"""
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+        future.set_result(result)
+        return result
+
+
+class SFDownloadUrlCache:
+    """
+    Temporary download URLs of the models (the `gltf` part of `/models/{uid}/download`), kept until they expire.
+
+    The cache is thread-safe.
+    """
+
+    def __init__(self, margin: float = 30):
+        """
+        :param margin: Time (in seconds) before their expiry after which URLs aren't used anymore
+        """
+        self.margin = margin
+        self._infos: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, uid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            info, expires_at = self._infos.get(uid, (None, 0.0))
+            if info is not None and time.monotonic() >= expires_at:
+                del self._infos[uid]
+                return None
+            return info
+
+    def put(self, uid: str, info: Dict[str, Any]):
+        """Keep a download URL, if the API told when it expires"""
+        expires = info.get('expires')
+        if not expires:
+            return
+        with self._lock:
+            self._infos[uid] = (info, time.monotonic() + float(expires) - self.margin)
+
+    def invalidate(self, uid: str):
+        with self._lock:
+            self._infos.pop(uid, None)
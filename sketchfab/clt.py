@@ -1,15 +1,25 @@
 """Sketfab client"""
+import datetime
 import json
 import logging
 import os
+import threading
+import time
 
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import requests.auth
-from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
-from sketchfab.api import SFModelsApi, SFCollectionsApi
+from sketchfab.api import API_URL, SFModelsApi, SFCollectionsApi, SFUpdateSession
+from sketchfab.cache import SFDownloadUrlCache, SFModelCache, SFSingleFlight
+from sketchfab.crawl import SFCrawler
+from sketchfab.dedup import SFUploadIndex
+from sketchfab.metrics import SFHookedAdapter, SFHooks
+from sketchfab.mirror import SFMirror, SFMirrorReport
 from sketchfab.models import SFCollection, SFModel
+from sketchfab.multipart import UploadProgress, UploadSource
+from sketchfab.scheduler import SFScheduler, SFSchedulingAdapter
+from sketchfab.writebehind import SFWriteBehind
 
 
 class SFCltAuth(requests.auth.AuthBase):
@@ -20,63 +30,290 @@ class SFCltAuth(requests.auth.AuthBase):
     def __init__(self, token: str):
         self.token = token
 
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Headers authenticating a request, for the clients not built on requests"""
+        return {'Authorization': f'Token {self.token}'}
+
     def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
-        r.headers['Authorization'] = f'Token {self.token}'
+        r.headers.update(self.headers)
         return r
 
 
+def resolve_api_token(api_token: str = None) -> str:
+    """
+    Find the API token to use: the one passed, the SKETCHFAB_API_TOKEN env var or the `~/.sketchfab-py.json` file
+    """
+    if not api_token:
+        api_token = os.getenv('SKETCHFAB_API_TOKEN')
+
+    if not api_token:
+        conf_file = os.path.join(os.getenv('HOME'), '.sketchfab-py.json')
+        if os.path.isfile(conf_file):
+            logging.info("Loading api key from %s", conf_file)
+            with open(conf_file) as f:
+                j = json.load(f)
+                api_token = j.get('apitoken')
+
+    if not api_token:
+        raise RuntimeError("You need to pass an API key or define the SKETCHFAB_API_TOKEN env var.")
+
+    return api_token
+
+
 class SFClient:
-    def __init__(self, api_token: str = None):
-        if not api_token:
-            api_token = os.getenv('SKETCHFAB_API_TOKEN')
+    def __init__(
+            self,
+            api_token: str = None,
+            pool_size: int = 10,
+            cache: SFModelCache = None,
+            collections_ttl: float = 300,
+            rate_limit: float = None,
+            scheduler: SFScheduler = None,
+            hooks: List[SFHooks] = None,
+            api_url: str = API_URL,
+            pool_connections: int = 10,
+            download_pool_size: int = None,
+            download_pool_connections: int = 10,
+            pool_block: bool = False,
+            upload_index: SFUploadIndex = None,
+    ):
+        """
+        :param api_token: API token, taken from the SKETCHFAB_API_TOKEN env var or the `~/.sketchfab-py.json` file
+        if not specified
+        :param pool_size: Number of connections kept per API host, it should be at least the number of threads
+        sharing the client
+        :param cache: Cache of the models fetched with `get_model`
+        :param collections_ttl: Time (in seconds) after which the collections index used by `get_collection` and
+        `get_collection_by_name` is rebuilt
+        :param rate_limit: Maximum number of API requests per second, shared by all the threads using the client
+        :param scheduler: Scheduler to use instead of creating one from `rate_limit`, to share a rate limit between
+        several clients
+        :param hooks: Hooks called on requests, retries and transferred chunks (like `sketchfab.metrics.SFMetrics`)
+        :param api_url: Base URL of the API, to use another server (like `benchmarks.fake_server`)
+        :param pool_connections: Number of hosts for which API connections are kept
+        :param download_pool_size: Number of connections kept per download (CDN) host, `pool_size` if not specified.
+        It should be at least the number of parallel downloads.
+        :param download_pool_connections: Number of download hosts for which connections are kept
+        :param pool_block: Make threads wait for a free connection when a pool is full, instead of opening a
+        connection which is closed after the request
+        :param upload_index: Index of the uploaded files, to avoid uploading the same content twice
 
-        if not api_token:
-            conf_file = os.path.join(os.getenv('HOME'), '.sketchfab-py.json')
-            if os.path.isfile(conf_file):
-                logging.info("Loading api key from %s", conf_file)
-                with open(conf_file) as f:
-                    j = json.load(f)
-                    api_token = j.get('apitoken')
+        The client can be shared by many threads: all the calls go through its two sessions, which keep their
+        connections alive.
+        """
+        api_token = resolve_api_token(api_token)
+        self.api_url = api_url.rstrip('/')
+        self.cache = cache
+        self.upload_index = upload_index
+        self.inflight = SFSingleFlight()
+        """Requests in flight, shared by the threads asking for the same model"""
+        self.download_urls = SFDownloadUrlCache()
+        """Temporary download URLs of the models, until they expire"""
+        self.collections_ttl = collections_ttl
+        self._collections_lock = threading.RLock()
+        self._collections_by_uid: Dict[str, SFCollection] = {}
+        self._collections_by_name: Dict[str, SFCollection] = {}
+        self._collections_names: Dict[str, str] = {}
+        self._collections_indexed_at: Optional[float] = None
 
-        if not api_token:
-            raise RuntimeError("You need to pass an API key or define the SKETCHFAB_API_TOKEN env var.")
+        self.scheduler = scheduler if scheduler else SFScheduler(rate=rate_limit)
+        self.hooks: List[SFHooks] = list(hooks) if hooks else []
+        """Hooks of the client, the list can be modified at any time"""
 
         s = requests.Session()
         s.auth = SFCltAuth(api_token)
         retries = Retry(
             total=30,
             backoff_factor=0.5,
-            method_whitelist=["HEAD", "GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],  # adding POST
-            status_forcelist=[429, 502, 503, 504],  # Adding 429
+            # POST isn't idempotent (comments, uploads...), it's only retried on 429 by the scheduling adapter
+            allowed_methods=["HEAD", "GET", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            status_forcelist=[502, 503, 504],
+        )
+        self.pool_size = pool_size
+        self.download_pool_size = download_pool_size or pool_size
+        self.pool_block = pool_block
+        adapter = SFSchedulingAdapter(
+            self.scheduler,
+            hooks=self.hooks,
+            pool_connections=pool_connections,
+            pool_maxsize=self.pool_size,
+            pool_block=pool_block,
+            max_retries=retries,
         )
-        s.mount('https://', HTTPAdapter(max_retries=retries))
+        s.mount('https://', adapter)
+        s.mount('http://', adapter)
         self._session = s
 
+        # Downloads are served by pre-signed URLs which must not receive the API token
+        ds = requests.Session()
+        adapter = SFHookedAdapter(
+            hooks=self.hooks,
+            api=False,
+            pool_connections=download_pool_connections,
+            pool_maxsize=self.download_pool_size,
+            pool_block=pool_block,
+            max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504]),
+        )
+        ds.mount('https://', adapter)
+        ds.mount('http://', adapter)
+        self._download_session = ds
+
     @property
     def session(self) -> requests.Session:
         return self._session
 
+    @property
+    def download_session(self) -> requests.Session:
+        """Session used to fetch the downloaded files"""
+        return self._download_session
+
     def models(self, sort_by: str = '-created_at', downloadable: bool = None, published: bool = None) -> List[SFModel]:
-        return SFModelsApi.list_mines(
+        return list(self.iter_models(sort_by=sort_by, downloadable=downloadable))
+
+    def iter_models(
+            self,
+            sort_by: str = '-created_at',
+            downloadable: bool = None,
+            count: int = 24,
+            cursor: str = None,
+            prefetch: bool = False,
+            fields: Iterable[str] = None,
+            stream: bool = False,
+            offset: int = 0,
+    ) -> Iterator[SFModel]:
+        """Lazily iterate over all your models (see `SFModelsApi.iter_mines`)"""
+        return SFModelsApi.iter_mines(
             self,
             sort_by=sort_by,
             downloadable=downloadable,
+            count=count,
+            cursor=cursor,
+            prefetch=prefetch,
+            fields=fields,
+            stream=stream,
+            offset=offset,
         )
 
     def collections(self) -> List[SFCollection]:
-        return SFCollectionsApi.list(self)
+        collections = list(self.iter_collections())
+        self._build_collections_index(collections)
+        return collections
+
+    def iter_collections(
+            self,
+            count: int = 24,
+            cursor: str = None,
+            prefetch: bool = False,
+            fields: Iterable[str] = None,
+            stream: bool = False,
+            offset: int = 0,
+    ) -> Iterator[SFCollection]:
+        """Lazily iterate over all your collections (see `SFCollectionsApi.iter_collections`)"""
+        return SFCollectionsApi.iter_collections(self, count=count, cursor=cursor, prefetch=prefetch, fields=fields,
+                                                 stream=stream, offset=offset)
 
     def create_collection(self, name: str, models: List[SFModel]) -> SFCollection:
-        return SFCollectionsApi.create(self, name, models)
+        collection = SFCollectionsApi.create(self, name, models)
+        self.index_collection(collection)
+        return collection
+
+    def _build_collections_index(self, collections: List[SFCollection]):
+        with self._collections_lock:
+            self._collections_by_uid = {}
+            self._collections_by_name = {}
+            self._collections_names = {}
+            for c in collections:
+                self._index_collection(c)
+            self._collections_indexed_at = time.monotonic()
+
+    def _index_collection(self, collection: SFCollection):
+        old_name = self._collections_names.get(collection.uid)
+        self._collections_by_uid[collection.uid] = collection
+        self._collections_names[collection.uid] = collection.name
+        if old_name is not None and old_name != collection.name:
+            # Renamed: the name now designates the next collection having it, if any
+            del self._collections_by_name[old_name]
+            for uid, name in self._collections_names.items():
+                if name == old_name:
+                    self._collections_by_name[name] = self._collections_by_uid[uid]
+                    break
+        # Names aren't unique, the first collection listed wins
+        self._collections_by_name.setdefault(collection.name, collection)
+
+    def index_collection(self, collection: SFCollection):
+        """Update the collections index after a collection was created or renamed"""
+        with self._collections_lock:
+            if self._collections_indexed_at is not None:
+                self._index_collection(collection)
+
+    def refresh_collections(self):
+        """Rebuild the collections index"""
+        self.collections()
+
+    def _collections_index(self):
+        with self._collections_lock:
+            if self._collections_indexed_at is None \
+                    or time.monotonic() - self._collections_indexed_at > self.collections_ttl:
+                self.refresh_collections()
+
+    def get_collection(self, uid: str) -> Optional[SFCollection]:
+        """Find a collection by uid in the collections index"""
+        self._collections_index()
+        return self._collections_by_uid.get(uid)
 
     def get_collection_by_name(self, name: str) -> Optional[SFCollection]:
-        for c in self.collections():
-            if c.name == name:
-                return c
-        return None
+        """Find a collection by name in the collections index"""
+        self._collections_index()
+        return self._collections_by_name.get(name)
+
+    def get_model(self, uid: str, use_cache: bool = True) -> Optional[SFModel]:
+        """Get a model (see `SFModelsApi.get_model`)"""
+        return SFModelsApi.get_model(self, uid, use_cache=use_cache)
+
+    def upload_model(
+            self,
+            file_path: UploadSource,
+            model: SFModel,
+            progress: UploadProgress = None,
+            **kwargs
+    ) -> Optional[SFModel]:
+        """Upload a model (see `SFModelsApi.upload_model`)"""
+        return SFModelsApi.upload_model(self, file_path, model, progress=progress, **kwargs)
+
+    def upload_many(
+            self,
+            paths: Iterable[str],
+            metadata: Union[Dict[str, SFModel], Callable[[str], SFModel]] = None,
+            workers: int = 4,
+            **kwargs
+    ) -> Iterator[Tuple[str, Optional[SFModel]]]:
+        """Upload many files in parallel and wait for their processing (see `SFModelsApi.upload_many`)"""
+        return SFModelsApi.upload_many(self, paths, metadata, workers=workers, **kwargs)
+
+    def bulk_update(self, models: Iterable[SFModel], workers: int = 8) -> Dict[str, bool]:
+        """Update many models in parallel (see `SFModelsApi.bulk_update`)"""
+        return SFModelsApi.bulk_update(self, models, workers=workers)
+
+    def update_session(self, workers: int = 8) -> SFUpdateSession:
+        """Collect modified models to update them all at once (see `SFUpdateSession`)"""
+        return SFUpdateSession(self, workers=workers)
+
+    def write_behind(self, path: str = ':memory:', **kwargs) -> SFWriteBehind:
+        """Queue mutations to send them in the background (see `sketchfab.writebehind.SFWriteBehind`)"""
+        return SFWriteBehind(self, path, **kwargs)
+
+    def download_many(self, models: Iterable[SFModel], dest_dir: str, workers: int = 4, **kwargs) -> Dict[str, str]:
+        """Download many models in parallel (see `SFModelsApi.download_many`)"""
+        return SFModelsApi.download_many(self, models, dest_dir, workers=workers, **kwargs)
 
-    def get_model(self, uid: str) -> Optional[SFModel]:
-        return SFModelsApi.get_model(self, uid)
+    def mirror(self, dest_dir: str, collection: SFCollection = None, **kwargs) -> SFMirrorReport:
+        """Synchronize a local mirror of your models, or of a collection (see `sketchfab.mirror.SFMirror`)"""
+        return SFMirror(self, dest_dir, collection=collection, **kwargs).sync()
 
-    def upload_model(self, file_path: str, model: SFModel) -> Optional[SFModel]:
-        return SFModelsApi.upload_model(self, file_path, model)
+    def crawl_public(self, start: datetime.date, sink: Union[str, Callable[[SFModel], None]] = None, **kwargs) -> int:
+        """
+        Crawl the public models published since a date, in parallel (see `sketchfab.crawl.SFCrawler`)
+        :return: Number of models passed to the sink
+        """
+        return SFCrawler(self, start, sink=sink, **kwargs).run()
@@ -0,0 +1,271 @@
+"""
+Parallel crawl of the public models, partitioned by publication date
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, TextIO, Tuple, Union
+
+from sketchfab.api import SFModelsApi
+from sketchfab.models import SFModel, project
+from sketchfab.pager import SFPager
+
+DAY = datetime.timedelta(days=1)
+
+Window = Tuple[datetime.date, datetime.date]
+"""Publication dates `[since, until)` of the models of a partition"""
+
+
+class SFCrawler:
+    """
+    Crawls the public search results by splitting them into publication date windows which are fetched in
+    parallel, each one with cursor pagination sorted by publication date.
+
+    The search only goes so deep into a listing (`result_cap` models): when a window reaches it, the remaining
+    dates of the window are split in two new windows, down to single days. Models are de-duplicated by uid (windows
+    overlap on the day where they were split) and passed to a sink, a function (called from the crawling threads)
+    or the path of a JSON lines file.
+
+    With a `checkpoint` file, the state of the crawl (finished windows and the cursors of the pending ones) is saved
+    after each page, along with the uids emitted so far (appended to `<checkpoint>.seen`), and a new crawler with the
+    same file resumes where the previous one stopped without emitting these models again. When the sink is a file,
+    the uids it already contains aren't emitted again either.
+
+    ```python
+    crawler = SFCrawler(clt, datetime.date(2020, 1, 1), sink='models.jsonl', checkpoint='crawl.json')
+    crawler.run()
+    ```
+    """
+
+    def __init__(
+            self,
+            clt: 'SFClient',
+            start: datetime.date,
+            end: datetime.date = None,
+            sink: Union[str, Callable[[SFModel], None]] = None,
+            checkpoint: str = None,
+            window: datetime.timedelta = datetime.timedelta(days=30),
+            result_cap: int = 1000,
+            workers: int = 8,
+            count: int = 24,
+            downloadable: bool = None,
+            fields: Iterable[str] = None,
+    ):
+        """
+        :param clt: Client
+        :param start: First publication date to crawl
+        :param end: Publication date to stop at (excluded), tomorrow if not specified
+        :param sink: Called with each model, or path of a JSON lines file to append the models to
+        :param checkpoint: Path of the file to save the progress of the crawl to
+        :param window: Initial size of the windows
+        :param result_cap: Number of results after which the search stops paginating
+        :param workers: Number of windows fetched in parallel
+        :param count: Number of models per page
+        :param downloadable: Only crawl the downloadable (or not downloadable) models
+        :param fields: Only keep these fields of each model (`uid` and `publishedAt` are always kept)
+        """
+        self.clt = clt
+        self.start = start
+        self.end = end or datetime.date.today() + DAY
+        self.checkpoint = checkpoint
+        self.window = max(window, DAY)
+        self.result_cap = result_cap
+        self.workers = workers
+        self.count = count
+        self.downloadable = downloadable
+        self.fields = None if fields is None else list({'uid', 'publishedAt', *fields})
+        self.seen: Set[str] = set()
+        """uids of the models emitted so far (including by a previous run)"""
+        self.emitted = 0
+        """Number of models emitted by this run"""
+        self.truncated: List[datetime.date] = []
+        """Days having more than `result_cap` models, which couldn't be entirely crawled"""
+        self._sink_path: Optional[str] = None
+        self._sink_file: Optional[TextIO] = None
+        self._sink_lock = threading.Lock()
+        self._unsaved: List[str] = []
+        """uids emitted since the last checkpoint"""
+        if isinstance(sink, str):
+            self._sink_path = sink
+            self.sink = self._write_jsonl
+        else:
+            self.sink = sink or (lambda m: None)
+        self._lock = threading.Lock()
+        self._done: List[Window] = []
+        self._pending: Dict[Window, Tuple[Optional[str], int]] = {}
+        """Windows being crawled, with the cursor of their current page and the number of models before it"""
+
+    @property
+    def _seen_path(self) -> str:
+        return f'{self.checkpoint}.seen'
+
+    def _write_jsonl(self, model: SFModel):
+        line = json.dumps(model.json) + '\n'
+        with self._sink_lock:
+            self._sink_file.write(line)
+            self._sink_file.flush()
+
+    def _load(self) -> List[Tuple[Window, Optional[str], int]]:
+        """Windows to crawl, with the cursor to start from and the number of models before it"""
+        if self._sink_path and os.path.exists(self._sink_path):
+            with open(self._sink_path) as f:
+                for line in f:
+                    try:
+                        self.seen.add(json.loads(line)['uid'])
+                    except (ValueError, KeyError):
+                        # Truncated by an interruption
+                        continue
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as f:
+                state = json.load(f)
+            if os.path.exists(self._seen_path):
+                with open(self._seen_path) as f:
+                    self.seen.update(line.strip() for line in f)
+            parse = datetime.date.fromisoformat
+            self._done = [(parse(a), parse(b)) for a, b in state['done']]
+            self.truncated = [parse(d) for d in state.get('truncated', [])]
+            return [((parse(a), parse(b)), cursor, fetched) for a, b, cursor, fetched in state['pending']]
+
+        windows = []
+        since = self.start
+        while since < self.end:
+            until = min(since + self.window, self.end)
+            windows.append(((since, until), None, 0))
+            since = until
+        return windows
+
+    def _save(self):
+        if not self.checkpoint:
+            return
+        with self._lock:
+            if self._unsaved:
+                with open(self._seen_path, 'a') as f:
+                    f.write(''.join(f'{uid}\n' for uid in self._unsaved))
+                self._unsaved = []
+            state = {
+                'start': self.start.isoformat(),
+                'end': self.end.isoformat(),
+                'done': [[a.isoformat(), b.isoformat()] for a, b in self._done],
+                'pending': [
+                    [a.isoformat(), b.isoformat(), cursor, fetched]
+                    for (a, b), (cursor, fetched) in self._pending.items()
+                ],
+                'truncated': [d.isoformat() for d in self.truncated],
+            }
+            tmp_path = f'{self.checkpoint}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.checkpoint)
+
+    def _emit(self, item: Dict[str, Any]):
+        uid = item['uid']
+        with self._lock:
+            if uid in self.seen:
+                return
+            self.seen.add(uid)
+        if self.fields is not None:
+            item = project(item, self.fields)
+        self.sink(SFModel(item, self.clt))
+        # Only checkpointed once the sink got it
+        with self._lock:
+            if self.checkpoint:
+                self._unsaved.append(uid)
+            self.emitted += 1
+
+    @staticmethod
+    def _split(since: datetime.date, until: datetime.date) -> List[Window]:
+        if until - since < 2 * DAY:
+            return [(since, until)]
+        middle = since + DAY * ((until - since).days // 2)
+        return [(since, middle), (middle, until)]
+
+    def _crawl(self, window: Window, cursor: Optional[str], fetched: int) -> List[Window]:
+        """
+        Crawl a window
+        :return: The windows to crawl next, if the result cap was reached
+        """
+        since, until = window
+        params = SFModelsApi._list_prepare_params_common(
+            downloadable=self.downloadable,
+            sort_by='publishedAt',
+            published_since=since,
+        )
+        pager = SFPager(self.clt, f'{self.clt.api_url}/search', params, SFModel, count=self.count, cursor=cursor)
+        until_str = until.isoformat()
+        last: Optional[str] = None
+        for page in pager.pages():
+            results = page.get('results', [])
+            for item in results:
+                published_at = item.get('publishedAt') or ''
+                if published_at >= until_str:
+                    return []
+                last = published_at
+                self._emit(item)
+            fetched += len(results)
+            next_cursor = SFPager._next_cursor(page)
+            if next_cursor:
+                # A resumed crawl starts after this page
+                with self._lock:
+                    self._pending[window] = (next_cursor, fetched)
+            self._save()
+            if fetched >= self.result_cap:
+                break
+        if pager.exhausted or last is None:
+            return []
+
+        # The cap was reached, the remaining days of the window are crawled as new windows
+        last_day = datetime.date.fromisoformat(last[:10])
+        if last_day <= since:
+            logging.warning("More than %d models published on %s, some of them are missing", self.result_cap, since)
+            with self._lock:
+                self.truncated.append(since)
+            last_day = since + DAY
+        if last_day >= until:
+            return []
+        return self._split(last_day, until)
+
+    def run(self) -> int:
+        """
+        Crawl all the windows
+        :return: Number of models emitted
+        """
+        windows = self._load()
+        if self._sink_path:
+            self._sink_file = open(self._sink_path, 'a')
+        try:
+            self._run(windows)
+        finally:
+            # The models emitted since the last page of each window aren't emitted again by a resumed crawl
+            self._save()
+            if self._sink_file:
+                self._sink_file.close()
+                self._sink_file = None
+        logging.info("Crawled %d models (%d days truncated)", self.emitted, len(self.truncated))
+        return self.emitted
+
+    def _run(self, windows: List[Tuple[Window, Optional[str], int]]):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures: Dict[Future, Window] = {}
+
+            def submit(w: Window, cursor: Optional[str], fetched: int):
+                with self._lock:
+                    self._pending[w] = (cursor, fetched)
+                futures[executor.submit(self._crawl, w, cursor, fetched)] = w
+
+            for w, cursor, fetched in windows:
+                submit(w, cursor, fetched)
+            self._save()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    w = futures.pop(future)
+                    next_windows = future.result()
+                    with self._lock:
+                        del self._pending[w]
+                        self._done.append(w)
+                    for nw in next_windows:
+                        submit(nw, None, 0)
+                    self._save()
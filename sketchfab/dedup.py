@@ -0,0 +1,93 @@
+"""
+Deduplication of the uploads by content hash
+"""
+import hashlib
+import io
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from sketchfab.multipart import UploadSource
+
+
+class SFUploadIndex:
+    """
+    Index of the uploaded files by SHA-256 of their content, mapping them to the uid of their model.
+
+    When a client has an index, `SFModelsApi.upload_model` hashes the file before uploading it and, if the same
+    content was already uploaded, skips the upload and only updates the metadata of the existing model.
+
+    The index is kept in memory and optionally in a SQLite database. With `remote_tags`, uploaded models are also
+    tagged with the hash of their file (`sha256-<first 32 hex digits>`), so that the files uploaded from another
+    machine (or before the index existed) are found by searching the account models.
+
+    The index is thread-safe and can be shared by several clients.
+    """
+
+    TAG_PREFIX = 'sha256-'
+
+    def __init__(self, path: str = None, remote_tags: bool = False):
+        """
+        :param path: Path of a SQLite database to persist the index to
+        :param remote_tags: Tag the uploaded models with their hash and search for these tags
+        """
+        self.remote_tags = remote_tags
+        self._uids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute('CREATE TABLE IF NOT EXISTS uploads (sha256 TEXT PRIMARY KEY, uid TEXT)')
+
+    @staticmethod
+    def hash_source(source: UploadSource, chunk_size: int = 1 << 20) -> Optional[str]:
+        """
+        SHA-256 of a file, read by chunks. A file object is rewound to its initial position afterwards.
+        :return: The hex digest, `None` if the source can't be read twice (like an iterator of bytes)
+        """
+        sha256 = hashlib.sha256()
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    sha256.update(chunk)
+            return sha256.hexdigest()
+        try:
+            position = source.tell()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            sha256.update(chunk)
+        source.seek(position)
+        return sha256.hexdigest()
+
+    def tag(self, digest: str) -> str:
+        """Tag identifying the models uploaded from a file"""
+        return f'{self.TAG_PREFIX}{digest[:32]}'
+
+    def with_tag(self, tags: Optional[List], digest: str) -> List[str]:
+        """Tag names (from names or API tag objects) with the one of a file, replacing any other hash tag"""
+        names = [t['name'] if isinstance(t, dict) else t for t in tags or []]
+        return [n for n in names if not n.startswith(self.TAG_PREFIX)] + [self.tag(digest)]
+
+    def get(self, digest: str) -> Optional[str]:
+        """uid of the model uploaded from a file"""
+        with self._lock:
+            uid = self._uids.get(digest)
+            if uid is None and self._db is not None:
+                row = self._db.execute('SELECT uid FROM uploads WHERE sha256 = ?', (digest,)).fetchone()
+                if row:
+                    uid = self._uids[digest] = row[0]
+            return uid
+
+    def put(self, digest: str, uid: str):
+        with self._lock:
+            self._uids[digest] = uid
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO uploads (sha256, uid) VALUES (?, ?)', (digest, uid))
+
+    def discard(self, digest: str):
+        """Forget a file, after its model was deleted"""
+        with self._lock:
+            self._uids.pop(digest, None)
+            if self._db is not None:
+                self._db.execute('DELETE FROM uploads WHERE sha256 = ?', (digest,))
@@ -0,0 +1,357 @@
+"""
+Inspection of the downloaded glTF assets, with [NumPy](https://numpy.org) (`pip install sketchfab[inspect]`).
+
+The binary buffers are memory-mapped and the geometry statistics are computed on views of the accessors, so that
+large meshes are never loaded as Python objects and only the pages of the buffers that are read hit the memory.
+
+```python
+stats = model.inspect_download(model.download_to_dir())
+print(stats.vertices, stats.triangles, stats.bounds)
+```
+"""
+import base64
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+import numpy as np
+
+COMPONENT_TYPES: Dict[int, str] = {
+    5120: '<i1',
+    5121: '<u1',
+    5122: '<i2',
+    5123: '<u2',
+    5125: '<u4',
+    5126: '<f4',
+}
+"""NumPy type of each accessor component type"""
+
+TYPE_SIZES: Dict[str, int] = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+"""Number of components of each accessor type"""
+
+TRIANGLES, TRIANGLE_STRIP, TRIANGLE_FAN = 4, 5, 6
+
+SIDECAR = '.sketchfab-inspect.json'
+"""Cache of the inspection of a downloaded directory, in this directory"""
+
+SIDECAR_VERSION = 1
+"""Version of the statistics, the sidecar files of other versions are ignored"""
+
+GLB_MAGIC = b'glTF'
+GLB_JSON = 0x4E4F534A
+GLB_BIN = 0x004E4942
+
+
+class SFGltfStats:
+    """Statistics of a glTF asset, counted over the mesh instances of its scene"""
+
+    def __init__(self, j: Dict[str, Any] = None):
+        j = j or {}
+        self.vertices: int = j.get('vertices', 0)
+        self.triangles: int = j.get('triangles', 0)
+        self.degenerate_triangles: int = j.get('degenerateTriangles', 0)
+        """Triangles having at least twice the same vertex"""
+        self.draw_calls: int = j.get('drawCalls', 0)
+        """Mesh primitives drawn by the scene"""
+        self.meshes: int = j.get('meshes', 0)
+        self.materials: int = j.get('materials', 0)
+        self.bounds: Optional[List[List[float]]] = j.get('bounds')
+        """Axis-aligned bounding box of the scene, as `[min, max]` points"""
+        self.textures: List[Dict[str, Any]] = j.get('textures', [])
+        """Images, with their `name`, `mimeType`, `width` and `height` (`None` if the format isn't known)"""
+        self.buffer_bytes: int = j.get('bufferBytes', 0)
+
+    @property
+    def json(self) -> Dict[str, Any]:
+        return {
+            'vertices': self.vertices,
+            'triangles': self.triangles,
+            'degenerateTriangles': self.degenerate_triangles,
+            'drawCalls': self.draw_calls,
+            'meshes': self.meshes,
+            'materials': self.materials,
+            'bounds': self.bounds,
+            'textures': self.textures,
+            'bufferBytes': self.buffer_bytes,
+        }
+
+    def __repr__(self):
+        return (f'SFGltfStats{{vertices={self.vertices}, triangles={self.triangles}, '
+                f'drawCalls={self.draw_calls}, textures={len(self.textures)}}}')
+
+
+def image_size(header: bytes) -> Optional[Tuple[int, int]]:
+    """Width and height of a PNG or JPEG image, from its first bytes"""
+    if header[:8] == b'\x89PNG\r\n\x1a\n' and len(header) >= 24:
+        return struct.unpack('>II', header[16:24])
+    if header[:2] == b'\xff\xd8':
+        i = 2
+        while i + 9 <= len(header):
+            if header[i] != 0xFF:
+                return None
+            marker = header[i + 1]
+            # Start of frame markers, except DHT, JPG and DAC
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', header[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack('>H', header[i + 2:i + 4])[0]
+    return None
+
+
+def _matrix(node: Dict[str, Any]) -> np.ndarray:
+    """Local transform of a node"""
+    if 'matrix' in node:
+        # Column-major
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+    x, y, z, w = node.get('rotation', [0, 0, 0, 1])
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    m = np.identity(4)
+    m[:3, :3] = rotation * np.array(node.get('scale', [1, 1, 1]))
+    m[:3, 3] = node.get('translation', [0, 0, 0])
+    return m
+
+
+class SFGltfInspector:
+    """
+    Computes the statistics of a `.gltf` (with its external or embedded buffers) or `.glb` file.
+
+    Positions and indices are read from memory-mapped views of the buffers, following the byte offsets and strides
+    of the accessors. Sparse accessors are read without their sparse values.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the `.gltf` or `.glb` file, or of a directory containing one (like `scene.gltf`)
+        """
+        self.path = find_asset(path) if os.path.isdir(path) else path
+        self.base_dir = os.path.dirname(self.path)
+        self._glb_bin: Optional[Tuple[int, int]] = None
+        """Offset and length of the binary chunk of a `.glb` file"""
+        self.gltf = self._load()
+        self._buffers: Dict[int, np.ndarray] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        with open(self.path, 'rb') as f:
+            if f.read(4) != GLB_MAGIC:
+                f.seek(0)
+                return json.load(f)
+            _version, length = struct.unpack('<II', f.read(8))
+            gltf = None
+            offset = 12
+            while offset < length:
+                chunk_length, chunk_type = struct.unpack('<II', f.read(8))
+                if chunk_type == GLB_JSON:
+                    gltf = json.loads(f.read(chunk_length))
+                elif chunk_type == GLB_BIN and self._glb_bin is None:
+                    self._glb_bin = (offset + 8, chunk_length)
+                    f.seek(chunk_length, os.SEEK_CUR)
+                else:
+                    f.seek(chunk_length, os.SEEK_CUR)
+                offset += 8 + chunk_length
+        if gltf is None:
+            raise ValueError(f"No JSON chunk in {self.path}")
+        return gltf
+
+    def _buffer(self, index: int) -> np.ndarray:
+        """Bytes of a buffer, memory-mapped when it's a file"""
+        if index not in self._buffers:
+            buffer = self.gltf['buffers'][index]
+            uri = buffer.get('uri')
+            if buffer.get('byteLength', 0) == 0:
+                data = np.zeros(0, dtype=np.uint8)
+            elif uri is None:
+                offset, length = self._glb_bin
+                data = np.memmap(self.path, dtype=np.uint8, mode='r', offset=offset, shape=(length,))
+            elif uri.startswith('data:'):
+                data = np.frombuffer(base64.b64decode(uri.split(',', 1)[1]), dtype=np.uint8)
+            else:
+                data = np.memmap(self._file(uri), dtype=np.uint8, mode='r')
+            self._buffers[index] = data
+        return self._buffers[index]
+
+    def _file(self, uri: str) -> str:
+        return os.path.join(self.base_dir, unquote(uri))
+
+    def accessor(self, index: int) -> np.ndarray:
+        """Values of an accessor, as a `(count, components)` view of its buffer"""
+        a = self.gltf['accessors'][index]
+        dtype = np.dtype(COMPONENT_TYPES[a['componentType']])
+        components = TYPE_SIZES[a['type']]
+        shape = (a['count'], components)
+        if 'bufferView' not in a:
+            return np.zeros(shape, dtype=dtype)
+        view = self.gltf['bufferViews'][a['bufferView']]
+        stride = view.get('byteStride') or dtype.itemsize * components
+        return np.ndarray(
+            shape,
+            dtype=dtype,
+            buffer=self._buffer(view['buffer']),
+            offset=view.get('byteOffset', 0) + a.get('byteOffset', 0),
+            strides=(stride, dtype.itemsize),
+        )
+
+    def _positions_bounds(self, index: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if self.gltf['accessors'][index]['count'] == 0:
+            return None
+        positions = self.accessor(index)
+        low, high = positions.min(axis=0).astype(np.float64), positions.max(axis=0).astype(np.float64)
+        if self.gltf['accessors'][index].get('normalized') and positions.dtype.kind in 'iu':
+            # Quantized positions (KHR_mesh_quantization)
+            scale = float(np.iinfo(positions.dtype).max)
+            low, high = np.maximum(low / scale, -1), np.maximum(high / scale, -1)
+        return low, high
+
+    def _primitive(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        """Vertices, triangles and local bounds of a mesh primitive"""
+        position = p.get('attributes', {}).get('POSITION')
+        vertices = self.gltf['accessors'][position]['count'] if position is not None else 0
+        mode = p.get('mode', TRIANGLES)
+        degenerate = 0
+        if 'indices' in p:
+            count = self.gltf['accessors'][p['indices']]['count']
+            if mode == TRIANGLES and count >= 3:
+                triangles = self.accessor(p['indices'])[:count - count % 3, 0].reshape(-1, 3)
+                degenerate = int(np.count_nonzero(
+                    (triangles[:, 0] == triangles[:, 1]) |
+                    (triangles[:, 1] == triangles[:, 2]) |
+                    (triangles[:, 0] == triangles[:, 2])
+                ))
+        else:
+            count = vertices
+        if mode == TRIANGLES:
+            triangles_count = count // 3
+        elif mode in (TRIANGLE_STRIP, TRIANGLE_FAN):
+            triangles_count = max(count - 2, 0)
+        else:
+            triangles_count = 0
+        return {
+            'vertices': vertices,
+            'triangles': triangles_count,
+            'degenerate': degenerate,
+            'bounds': self._positions_bounds(position) if position is not None else None,
+        }
+
+    def _instances(self) -> List[Tuple[int, np.ndarray]]:
+        """Meshes drawn by the scene, with their world transform"""
+        nodes = self.gltf.get('nodes', [])
+        scenes = self.gltf.get('scenes', [])
+        if scenes:
+            roots = scenes[self.gltf.get('scene', 0)].get('nodes', [])
+        else:
+            children = {c for n in nodes for c in n.get('children', [])}
+            roots = [i for i in range(len(nodes)) if i not in children]
+        if not nodes:
+            # A file without nodes only defines its meshes
+            return [(i, np.identity(4)) for i in range(len(self.gltf.get('meshes', [])))]
+
+        instances = []
+        stack = [(i, np.identity(4)) for i in roots]
+        while stack:
+            index, parent = stack.pop()
+            node = nodes[index]
+            world = parent @ _matrix(node)
+            if 'mesh' in node:
+                instances.append((node['mesh'], world))
+            stack.extend((c, world) for c in node.get('children', []))
+        return instances
+
+    def _texture(self, image: Dict[str, Any]) -> Dict[str, Any]:
+        header = b''
+        if 'bufferView' in image:
+            view = self.gltf['bufferViews'][image['bufferView']]
+            start = view.get('byteOffset', 0)
+            header = self._buffer(view['buffer'])[start:start + min(view['byteLength'], 1 << 16)].tobytes()
+        elif image.get('uri', '').startswith('data:'):
+            header = base64.b64decode(image['uri'].split(',', 1)[1])[:1 << 16]
+        elif image.get('uri') and os.path.exists(self._file(image['uri'])):
+            with open(self._file(image['uri']), 'rb') as f:
+                header = f.read(1 << 16)
+        size = image_size(header)
+        return {
+            'name': image.get('name') or image.get('uri', '')[:64],
+            'mimeType': image.get('mimeType'),
+            'width': size[0] if size else None,
+            'height': size[1] if size else None,
+        }
+
+    def inspect(self) -> SFGltfStats:
+        stats = SFGltfStats()
+        meshes = self.gltf.get('meshes', [])
+        stats.meshes = len(meshes)
+        stats.materials = len(self.gltf.get('materials', []))
+        stats.buffer_bytes = sum(b.get('byteLength', 0) for b in self.gltf.get('buffers', []))
+        primitives: Dict[int, List[Dict[str, Any]]] = {}
+        low, high = np.full(3, np.inf), np.full(3, -np.inf)
+        for mesh, world in self._instances():
+            if mesh not in primitives:
+                primitives[mesh] = [self._primitive(p) for p in meshes[mesh].get('primitives', [])]
+            for p in primitives[mesh]:
+                stats.draw_calls += 1
+                stats.vertices += p['vertices']
+                stats.triangles += p['triangles']
+                stats.degenerate_triangles += p['degenerate']
+                if p['bounds'] is None:
+                    continue
+                # The corners of the local box, transformed, bound the transformed primitive
+                corners = np.array(np.meshgrid(*zip(*p['bounds']), indexing='ij')).reshape(3, -1)
+                transformed = world[:3, :3] @ corners + world[:3, 3:]
+                low, high = np.minimum(low, transformed.min(axis=1)), np.maximum(high, transformed.max(axis=1))
+        if np.all(np.isfinite(low)):
+            stats.bounds = [low.tolist(), high.tolist()]
+        stats.textures = [self._texture(image) for image in self.gltf.get('images', [])]
+        self._buffers = {}
+        return stats
+
+
+def find_asset(path: str) -> str:
+    """glTF file of a downloaded directory, `scene.gltf` or the first `.gltf` / `.glb` file found"""
+    candidates = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name == 'scene.gltf':
+                return os.path.join(root, name)
+            if name.endswith(('.gltf', '.glb')):
+                candidates.append(os.path.join(root, name))
+    if not candidates:
+        raise FileNotFoundError(f"No glTF file in {path}")
+    return candidates[0]
+
+
+def inspect(path: str) -> SFGltfStats:
+    """Statistics of a glTF file, or of the glTF file of a directory"""
+    return SFGltfInspector(path).inspect()
+
+
+def inspect_download(path: str, uid: str = None, updated_at: str = None) -> SFGltfStats:
+    """
+    Statistics of a downloaded model, cached in a sidecar file (`.sketchfab-inspect.json` in a directory,
+    `<file>.inspect.json` next to a file) until the model is updated. Without both the uid and the update date, an
+    update couldn't be noticed and the statistics aren't cached.
+    :param path: Directory the model was extracted to, or its glTF file
+    :param uid: uid of the model
+    :param updated_at: Last update date of the model
+    """
+    if not uid or not updated_at:
+        return inspect(path)
+    sidecar = os.path.join(path, SIDECAR) if os.path.isdir(path) else f'{path}.inspect.json'
+    key = {'version': SIDECAR_VERSION, 'uid': uid, 'updatedAt': updated_at}
+    try:
+        with open(sidecar) as f:
+            cached = json.load(f)
+        if all(cached.get(k) == v for k, v in key.items()):
+            return SFGltfStats(cached['stats'])
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    stats = inspect(path)
+    tmp_path = f'{sidecar}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(key, stats=stats.json), f)
+    os.replace(tmp_path, sidecar)
+    return stats
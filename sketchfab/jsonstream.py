@@ -0,0 +1,116 @@
+"""
+Incremental decoding of the listing responses
+"""
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from sketchfab.models import project
+
+_WHITESPACE = re.compile(r'\s*')
+
+
+class SFResultsStream:
+    """
+    Decodes the items of the `results` array of a listing response while it is being received, instead of loading
+    the whole body and its decoded tree in memory.
+
+    Each item is decoded on its own (and projected on `fields`, if given) and the text it was decoded from is
+    discarded, so the memory used doesn't depend on the size of the page. The other members of the response
+    (`cursors`, `next`, ...) are available in `rest` once the items have all been iterated.
+
+    ```python
+    r = clt.session.get(url, stream=True)
+    stream = SFResultsStream(r.iter_content(65536), fields=['uid', 'name'])
+    for item in stream:
+        ...
+    next_cursor = stream.rest['cursors']['next']
+    ```
+    """
+
+    def __init__(self, chunks: Iterable[bytes], key: str = 'results', fields: Iterable[str] = None):
+        """
+        :param chunks: Body of the response
+        :param key: Member of the response holding the items
+        :param fields: Only keep these fields of each item
+        """
+        self.key = key
+        self.fields = list(fields) if fields is not None else None
+        self.rest: Dict[str, Any] = {}
+        """Members of the response other than the items"""
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _read(self) -> bool:
+        """Append the next chunk to the buffer, dropping what was already decoded"""
+        if self._eof:
+            return False
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            self._buf += self._utf8.decode(b'', final=True)
+        else:
+            self._buf += self._utf8.decode(chunk)
+        return True
+
+    def _peek(self) -> Optional[str]:
+        """Next non-whitespace character, `None` at the end of the body"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read():
+                return None
+
+    def _expect(self, chars: str) -> str:
+        c = self._peek()
+        if c is None or c not in chars:
+            raise ValueError(f"Expected one of {chars!r} at {self._pos} of the response, got {c!r}")
+        self._pos += 1
+        return c
+
+    def _value(self) -> Any:
+        """Decode the next JSON value"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number at the end of the buffer might continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._read()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == self.key and self._peek() == '[':
+                self._pos += 1
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        item = self._value()
+                        if self.fields is not None:
+                            item = project(item, self.fields)
+                        yield item
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.rest[key] = self._value()
+            if self._expect(',}') == '}':
+                return
@@ -0,0 +1,232 @@
+"""
+Request instrumentation
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_UID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def endpoint_of(url: str, api: bool = True) -> str:
+    """
+    Endpoint of an URL, used to aggregate metrics: API paths without their version and with their uids replaced
+    by `{uid}` (like `/models/{uid}`), or the host for other servers (like the download ones).
+    """
+    parsed = urlparse(url)
+    if not api:
+        return parsed.netloc
+    segments = parsed.path.split('/')
+    if len(segments) > 1 and re.match(r'^v\d+$', segments[1]):
+        del segments[1]
+    return '/'.join('{uid}' if _UID.match(s) else s for s in segments)
+
+
+class SFHooks:
+    """
+    Client hooks, to be subclassed and passed to `SFClient`. All the methods do nothing by default.
+    """
+
+    def on_request_start(self, method: str, endpoint: str, url: str):
+        pass
+
+    def on_request_end(self, method: str, endpoint: str, status: int, duration: float, sent: int, received: int):
+        """
+        :param status: Status code of the response, 0 if none was received (see `on_request_error`)
+        :param duration: Time until the response headers were received (in seconds)
+        :param sent: Size of the request body
+        :param received: Size of the response body, if announced (it is only read later for streamed responses)
+        """
+
+    def on_request_error(self, method: str, endpoint: str, error: Exception):
+        """Called after `on_request_end` when no response was received (connection error, timeout, ...)"""
+
+    def on_retry(self, method: str, endpoint: str, status: Optional[int], reason: str):
+        pass
+
+    def on_download_chunk(self, uid: str, size: int):
+        pass
+
+    def on_upload_chunk(self, size: int):
+        pass
+
+
+def call_hooks(hooks: Sequence[SFHooks], event: str, *args):
+    """Call a method on all hooks, a failing hook doesn't break the request"""
+    for hook in hooks:
+        try:
+            getattr(hook, event)(*args)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Hook %s failed on %s", hook, event)
+
+
+class SFHookedAdapter(HTTPAdapter):
+    """Transport adapter calling the request and retry hooks"""
+
+    def __init__(self, hooks: List[SFHooks] = None, api: bool = True, **kwargs):
+        """
+        :param hooks: Hooks to call, the list can be modified later on
+        :param api: If the adapter is used for the API (otherwise the endpoints are reduced to the host)
+        """
+        self.hooks = hooks if hooks is not None else []
+        self.api = api
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:  # pylint: disable=arguments-differ
+        if not self.hooks:
+            return super().send(request, **kwargs)
+        endpoint = endpoint_of(request.url, self.api)
+        call_hooks(self.hooks, 'on_request_start', request.method, endpoint, request.url)
+        sent = int(request.headers.get('content-length') or 0)
+        start = time.monotonic()
+        try:
+            r = super().send(request, **kwargs)
+        except Exception as e:
+            call_hooks(self.hooks, 'on_request_end', request.method, endpoint, 0, time.monotonic() - start, sent, 0)
+            call_hooks(self.hooks, 'on_request_error', request.method, endpoint, e)
+            raise
+        duration = time.monotonic() - start
+        retries = getattr(r.raw, 'retries', None)
+        for retry in getattr(retries, 'history', ()):
+            call_hooks(self.hooks, 'on_retry', request.method, endpoint, retry.status, str(retry.error or retry.status))
+        call_hooks(
+            self.hooks, 'on_request_end', request.method, endpoint, r.status_code, duration,
+            sent, int(r.headers.get('content-length') or 0),
+        )
+        return r
+
+
+class SFMetrics(SFHooks):
+    """
+    Metrics collector: latency histograms, status codes, errors, retries and transferred bytes per endpoint.
+
+    ```python
+    metrics = SFMetrics()
+    clt = SFClient(hooks=[metrics])
+    ...
+    print(metrics.to_prometheus())
+    ```
+    """
+
+    BUCKETS: List[float] = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+    """Upper bounds (in seconds) of the latency histogram buckets"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.endpoints: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.downloaded = 0
+        self.uploaded = 0
+
+    def _endpoint(self, method: str, endpoint: str) -> Dict[str, Any]:
+        key = (method, endpoint)
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = {
+                'count': 0,
+                'duration': 0.0,
+                'buckets': [0] * (len(self.BUCKETS) + 1),
+                'statuses': {},
+                'retries': 0,
+                'errors': {},
+                'sent': 0,
+                'received': 0,
+            }
+        return stats
+
+    def on_request_end(self, method: str, endpoint: str, status: int, duration: float, sent: int, received: int):
+        with self._lock:
+            stats = self._endpoint(method, endpoint)
+            stats['count'] += 1
+            stats['duration'] += duration
+            stats['buckets'][bisect.bisect_left(self.BUCKETS, duration)] += 1
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['sent'] += sent
+            stats['received'] += received
+
+    def on_retry(self, method: str, endpoint: str, status: Optional[int], reason: str):
+        with self._lock:
+            self._endpoint(method, endpoint)['retries'] += 1
+
+    def on_request_error(self, method: str, endpoint: str, error: Exception):
+        with self._lock:
+            errors = self._endpoint(method, endpoint)['errors']
+            name = type(error).__name__
+            errors[name] = errors.get(name, 0) + 1
+
+    def on_download_chunk(self, uid: str, size: int):
+        with self._lock:
+            self.downloaded += size
+
+    def on_upload_chunk(self, size: int):
+        with self._lock:
+            self.uploaded += size
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            return {
+                'elapsed': elapsed,
+                'downloaded': self.downloaded,
+                'uploaded': self.uploaded,
+                'download_throughput': self.downloaded / elapsed if elapsed else 0.0,
+                'upload_throughput': self.uploaded / elapsed if elapsed else 0.0,
+                'endpoints': {
+                    f'{method} {endpoint}': {
+                        'count': s['count'],
+                        'duration': s['duration'],
+                        'mean_duration': s['duration'] / s['count'] if s['count'] else 0.0,
+                        'histogram': dict(zip([str(b) for b in self.BUCKETS] + ['+Inf'], s['buckets'])),
+                        'statuses': dict(s['statuses']),
+                        'retries': s['retries'],
+                        'errors': dict(s['errors']),
+                        'sent': s['sent'],
+                        'received': s['received'],
+                    }
+                    for (method, endpoint), s in self.endpoints.items()
+                },
+            }
+
+    def to_prometheus(self, prefix: str = 'sketchfab') -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = [
+            f'# TYPE {prefix}_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            for (method, endpoint), s in endpoints:
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                cumulated = 0
+                for bound, count in zip([str(b) for b in self.BUCKETS] + ['+Inf'], s['buckets']):
+                    cumulated += count
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulated}')
+                lines.append(f'{prefix}_request_duration_seconds_sum{{{labels}}} {s["duration"]}')
+                lines.append(f'{prefix}_request_duration_seconds_count{{{labels}}} {s["count"]}')
+            lines.append(f'# TYPE {prefix}_responses_total counter')
+            for (method, endpoint), s in endpoints:
+                for status, count in sorted(s['statuses'].items()):
+                    lines.append(
+                        f'{prefix}_responses_total{{method="{method}",endpoint="{endpoint}",status="{status}"}} {count}'
+                    )
+            lines.append(f'# TYPE {prefix}_request_errors_total counter')
+            for (method, endpoint), s in endpoints:
+                for error, count in sorted(s['errors'].items()):
+                    lines.append(
+                        f'{prefix}_request_errors_total{{method="{method}",endpoint="{endpoint}",error="{error}"}} '
+                        f'{count}'
+                    )
+            lines.append(f'# TYPE {prefix}_retries_total counter')
+            for (method, endpoint), s in endpoints:
+                lines.append(f'{prefix}_retries_total{{method="{method}",endpoint="{endpoint}"}} {s["retries"]}')
+            lines.append(f'# TYPE {prefix}_downloaded_bytes_total counter')
+            lines.append(f'{prefix}_downloaded_bytes_total {self.downloaded}')
+            lines.append(f'# TYPE {prefix}_uploaded_bytes_total counter')
+            lines.append(f'{prefix}_uploaded_bytes_total {self.uploaded}')
+        return '\n'.join(lines) + '\n'
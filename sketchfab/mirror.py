@@ -0,0 +1,305 @@
+"""
+Incremental mirror of models to a local directory
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from sketchfab.api import SFModelsApi
+from sketchfab.models import SFCollection, SFModel
+
+MANIFEST = '.sketchfab-mirror.json'
+"""Manifest of the mirrored models, in the mirror directory"""
+
+DELETED_ACTIONS = ['archive', 'remove', 'keep']
+
+
+class SFMirrorReport:
+    """Outcome of a mirror synchronization, as lists of uids"""
+
+    def __init__(self):
+        self.added: List[str] = []
+        self.updated: List[str] = []
+        self.unchanged: List[str] = []
+        self.deleted: List[str] = []
+        self.failed: Dict[str, str] = {}
+        """Error of each model that couldn't be fetched, it will be retried on the next synchronization"""
+
+    def __repr__(self):
+        return (f'SFMirrorReport{{added={len(self.added)}, updated={len(self.updated)}, '
+                f'unchanged={len(self.unchanged)}, deleted={len(self.deleted)}, failed={len(self.failed)}}}')
+
+
+class SFMirror:
+    """
+    Keeps a local directory in sync with the models of the account (or of a collection).
+
+    Each model is extracted to a `<uid>` directory (or kept as a `<uid>.zip` archive without `extract`). The
+    `.sketchfab-mirror.json` manifest records the `updatedAt` and the MD5 checksum of the archive of each mirrored
+    model, so that a synchronization only downloads the new and changed models, and doesn't extract an archive
+    which didn't actually change (its checksum is first compared to the ETag of the download server, so that a
+    metadata-only change doesn't even download it). Models which are no longer listed are archived in `.deleted/`,
+    removed or kept.
+
+    Synchronizations are resumable: each fetched model is immediately appended to a journal (merged into the
+    manifest at the end), and interrupted downloads are resumed from their `.part` file. A lock file prevents
+    two synchronizations of the same directory from running at once.
+    """
+
+    def __init__(
+            self,
+            clt: 'SFClient',
+            dest_dir: str,
+            collection: SFCollection = None,
+            workers: int = 4,
+            extract: bool = True,
+            on_deleted: str = 'archive',
+    ):
+        """
+        :param clt: Client
+        :param dest_dir: Directory of the mirror
+        :param collection: Only mirror the models of this collection
+        :param workers: Number of parallel downloads
+        :param extract: Extract the archives, otherwise keep them as `<uid>.zip` files
+        :param on_deleted: What to do with the models which are no longer listed: `archive` them in `.deleted/`,
+        `remove` them or `keep` them
+        """
+        assert on_deleted in DELETED_ACTIONS, f"on_deleted should be one of {DELETED_ACTIONS}"
+        self.clt = clt
+        self.dest_dir = dest_dir
+        self.collection = collection
+        self.workers = workers
+        self.extract = extract
+        self.on_deleted = on_deleted
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        """Mirrored models, by uid"""
+        self._lock = threading.Lock()
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.dest_dir, MANIFEST)
+
+    @property
+    def _journal_path(self) -> str:
+        return f'{self._manifest_path}.journal'
+
+    @property
+    def _lock_path(self) -> str:
+        return f'{self._manifest_path}.lock'
+
+    @property
+    def _downloads_dir(self) -> str:
+        return os.path.join(self.dest_dir, '.downloads')
+
+    def _path(self, uid: str) -> str:
+        return os.path.join(self.dest_dir, uid if self.extract else f'{uid}.zip')
+
+    def _acquire(self):
+        os.makedirs(self.dest_dir, exist_ok=True)
+        # The lock is written aside and linked in place, so that it is never seen without its pid
+        tmp_path = f'{self._lock_path}.{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            f.write(str(os.getpid()))
+        try:
+            while True:
+                try:
+                    os.link(tmp_path, self._lock_path)
+                    return
+                except FileExistsError:
+                    pass
+                try:
+                    with open(self._lock_path) as f:
+                        pid = int(f.read())
+                    if pid <= 0:
+                        raise ValueError(f"Invalid pid {pid}")
+                    os.kill(pid, 0)
+                except (ValueError, ProcessLookupError):
+                    logging.warning("Removing the stale lock of the mirror %s", self.dest_dir)
+                    try:
+                        os.remove(self._lock_path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                except FileNotFoundError:
+                    # Released in the meantime
+                    continue
+                except PermissionError:
+                    pass
+                raise RuntimeError(f"The mirror {self.dest_dir} is already being synchronized ({self._lock_path})")
+        finally:
+            os.remove(tmp_path)
+
+    def _release(self):
+        os.remove(self._lock_path)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the manifest, with the models fetched by an interrupted synchronization"""
+        try:
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)['models']
+        except FileNotFoundError:
+            self.manifest = {}
+        try:
+            with open(self._journal_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Truncated by the interruption
+                        continue
+                    if entry.get('deleted'):
+                        self.manifest.pop(entry['uid'], None)
+                    else:
+                        self.manifest[entry['uid']] = entry
+        except FileNotFoundError:
+            pass
+        return self.manifest
+
+    def _journal(self, entry: Dict[str, Any]):
+        with self._lock:
+            if entry.get('deleted'):
+                self.manifest.pop(entry['uid'], None)
+            else:
+                self.manifest[entry['uid']] = entry
+            with open(self._journal_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def _save(self):
+        tmp_path = f'{self._manifest_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'collection': self.collection.uid if self.collection else None,
+                'models': self.manifest,
+            }, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path)
+        if os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+
+    def _is_unchanged(self, model: SFModel) -> bool:
+        entry = self.manifest.get(model.uid)
+        return bool(entry) and entry.get('updatedAt') == model.updated_at and os.path.exists(self._path(model.uid))
+
+    @staticmethod
+    def _remove(path: str):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _install(self, uid: str, archive: str):
+        """Move a downloaded archive (or its content) to its place in the mirror"""
+        path = self._path(uid)
+        if not self.extract:
+            os.replace(archive, path)
+            return
+        tmp_path = f'{path}.tmp'
+        self._remove(tmp_path)
+        SFModelsApi._extract(archive, tmp_path, None)
+        old_path = f'{path}.old'
+        if os.path.exists(path):
+            self._remove(old_path)
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        self._remove(old_path)
+        os.remove(archive)
+
+    def _remote_md5(self, model: SFModel) -> Optional[str]:
+        """MD5 of the current archive of a model, from the ETag of the download server (without downloading it)"""
+        url = SFModelsApi._download_info(self.clt, model)['url']
+        r = self.clt.download_session.get(url, headers={'Range': 'bytes=0-0'}, stream=True)
+        r.close()
+        return SFModelsApi._etag_md5(r) if r.ok else None
+
+    def _fetch(self, model: SFModel) -> bool:
+        """
+        Download a new or changed model
+        :return: If the content of the model changed
+        """
+        entry = self.manifest.get(model.uid)
+        installed = bool(entry) and os.path.exists(self._path(model.uid))
+        md5 = self._remote_md5(model) if installed else None
+        changed = not installed or not md5 or entry.get('md5') != md5
+        if changed:
+            archive = SFModelsApi.download(self.clt, model, dest_dir=self._downloads_dir)
+            md5 = SFModelsApi._file_md5(archive)
+            changed = not installed or entry.get('md5') != md5
+            if changed:
+                self._install(model.uid, archive)
+            else:
+                os.remove(archive)
+            self._remove(f'{archive}.json')
+        self._journal({
+            'uid': model.uid,
+            'name': model.name,
+            'updatedAt': model.updated_at,
+            'md5': md5,
+            'path': os.path.basename(self._path(model.uid)),
+            'syncedAt': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+        return changed
+
+    def _delete(self, uid: str):
+        path = self._path(uid)
+        if self.on_deleted == 'keep':
+            pass
+        elif self.on_deleted == 'archive' and os.path.exists(path):
+            archive_dir = os.path.join(self.dest_dir, '.deleted')
+            os.makedirs(archive_dir, exist_ok=True)
+            archived = os.path.join(archive_dir, os.path.basename(path))
+            self._remove(archived)
+            os.replace(path, archived)
+        else:
+            self._remove(path)
+        self._journal({'uid': uid, 'deleted': True})
+
+    def sync(self) -> SFMirrorReport:
+        """Fetch the new and changed models and handle the deleted ones"""
+        report = SFMirrorReport()
+        self._acquire()
+        try:
+            self.load()
+            listed = set()
+            to_fetch = []
+            for m in SFModelsApi.iter_mines(self.clt, collection=self.collection, prefetch=True,
+                                            fields=['uid', 'name', 'updatedAt']):
+                if m.uid in listed:
+                    continue
+                listed.add(m.uid)
+                if self._is_unchanged(m):
+                    report.unchanged.append(m.uid)
+                else:
+                    to_fetch.append(m)
+
+            known = set(self.manifest)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self._fetch, m): m for m in to_fetch}
+                for future in as_completed(futures):
+                    model = futures[future]
+                    try:
+                        changed = future.result()
+                    except Exception as e:  # pylint: disable=broad-except
+                        logging.warning("Could not mirror model %s: %s", model.uid, e)
+                        report.failed[model.uid] = str(e)
+                        continue
+                    if model.uid not in known:
+                        report.added.append(model.uid)
+                    elif changed:
+                        report.updated.append(model.uid)
+                    else:
+                        report.unchanged.append(model.uid)
+
+            # The listing is complete at this point, models missing from it were really deleted
+            for uid in [uid for uid in self.manifest if uid not in listed]:
+                self._delete(uid)
+                report.deleted.append(uid)
+
+            self._save()
+        finally:
+            self._release()
+        logging.info("Mirror %s synchronized: %s", self.dest_dir, report)
+        return report
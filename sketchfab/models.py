@@ -1,10 +1,17 @@
 """
 Sketchfab models
 """
-from typing import Dict, Any, List, Union
+import copy
+import json
+import sys
+from typing import Callable, Dict, Any, Iterable, List, Optional, Union
+
+_MISSING = object()
 
 
 class SFModelOptions:
+    __slots__ = ('parent', 'json')
+
     def __init__(self, parent: 'SFModel'):
         self.parent = parent
         self.json = parent.json.get('options')
@@ -17,29 +24,88 @@ class SFModelOptions:
 
     @shading.setter
     def shading(self, value: str):
-        assert value in 'shadeless', 'lit'
+        assert value in ('shadeless', 'lit')
         self.set_property('shading', value)
 
     def set_property(self, name: str, value: Any):
-        self.json[name] = value
+        # Marking the options as modified first keeps their previous value
         self.parent.set_property('options', self.json)
+        self.json[name] = value
+
+
+def project(j: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Only keep some fields of a JSON object, with interned keys so that they are shared by all the objects"""
+    return {sys.intern(k): j[k] for k in fields if k in j}
 
 
 class SFModel:
     """
     [3D Model](https://docs.sketchfab.com/data-api/v3/index.html#/models)
+
+    Models of large listings are kept small by projecting them on a few fields (see `project`). A model can also be
+    created from the raw JSON of an API response (like in `SFModelsApi.get_model`), which is only decoded when a
+    property is first accessed.
     """
+    __slots__ = ('_raw', '_json', '_modified', '_original', '_options', 'clt')
 
-    def __init__(self, j: Dict[str, Any] = None, clt: 'SketchFabClient' = None):
-        self.json = j if j else {}
-        self.modified: List[str] = []
+    def __init__(self, j: Union[Dict[str, Any], bytes, str] = None, clt: 'SketchFabClient' = None):
+        """
+        :param j: JSON of the model, either decoded or raw
+        :param clt: Client
+        """
+        if isinstance(j, (bytes, str)):
+            self._raw = j
+            self._json = None
+        else:
+            self._raw = None
+            self._json = j if j else {}
+        self._modified: Optional[List[str]] = None
+        self._original: Optional[Dict[str, Any]] = None
+        self._options: Optional[SFModelOptions] = None
         self.clt = clt
 
+    @property
+    def json(self) -> Dict[str, Any]:
+        """JSON of the model, decoded on first access"""
+        if self._json is None:
+            self._json = json.loads(self._raw)
+            self._raw = None
+        return self._json
+
+    @json.setter
+    def json(self, value: Dict[str, Any]):
+        self._json = value
+        self._raw = None
+        self._options = None
+
+    @property
+    def modified(self) -> List[str]:
+        """Properties modified since the model was fetched or last saved"""
+        if self._modified is None:
+            self._modified = []
+        return self._modified
+
+    @modified.setter
+    def modified(self, value: List[str]):
+        self._modified = value
+
     def set_property(self, name: str, value: Any):
         if name not in self.modified:
+            # Keep the last known server value, to detect no-op changes
+            if self._original is None:
+                self._original = {}
+            self._original[name] = copy.deepcopy(self.json.get(name, _MISSING))
             self.modified.append(name)
         self.json[name] = value
 
+    def changes(self) -> Dict[str, Any]:
+        """Modified properties whose value differs from the last known server one"""
+        return {
+            name: self.json[name]
+            for name in self.modified
+            if self.json.get(name, _MISSING) != (self._original or {}).get(name, _MISSING)
+        }
+
     @property
     def name(self) -> str:
         """name of the model"""
@@ -83,6 +149,16 @@ class SFModel:
         """viewer URL (to be opened in a browser)"""
         return self.json.get('viewerUrl')
 
+    @property
+    def updated_at(self) -> Optional[str]:
+        """Last update date of the model"""
+        return self.json.get('updatedAt')
+
+    @property
+    def processing_status(self) -> Optional[str]:
+        """Processing status of the uploaded model: PENDING, PROCESSING, SUCCEEDED or FAILED"""
+        return (self.json.get('status') or {}).get('processing')
+
     @property
     def is_published(self) -> bool:
         return self.json.get('publishedAt') is not None
@@ -93,11 +169,13 @@ class SFModel:
 
     @private.setter
     def private(self, value: bool):
-        self.json['private'] = value
+        self.set_property('private', value)
 
     @property
     def options(self) -> SFModelOptions:
-        return SFModelOptions(self)
+        if self._options is None or self._options.json is not self.json.get('options', self._options.json):
+            self._options = SFModelOptions(self)
+        return self._options
 
     def comment(self, msg: str):
         """Add a comment to a model"""
@@ -109,16 +187,30 @@ class SFModel:
         from sketchfab.api import SFModelsApi
         return SFModelsApi.download(self.clt, self)
 
-    def download_to_dir(self) -> str:
-        """Download a model as a directory"""
+    def download_to_dir(
+            self,
+            dest_dir: str = None,
+            members: Union[Iterable[str], Callable[[str], bool]] = None,
+            stream: bool = True,
+    ) -> str:
+        """Download a model as a directory (see `SFModelsApi.download_to_dir`)"""
         from sketchfab.api import SFModelsApi
-        return SFModelsApi.download_to_dir(self.clt, self)
+        return SFModelsApi.download_to_dir(self.clt, self, dest_dir=dest_dir, members=members, stream=stream)
 
     def update(self) -> bool:
         """Update a model"""
         from sketchfab.api import SFModelsApi
         return SFModelsApi.update_model(self.clt, self)
 
+    def inspect_download(self, path: str) -> 'SFGltfStats':
+        """
+        Statistics of the downloaded glTF asset of the model, cached until the model is updated (see
+        `sketchfab.gltf.inspect_download`, needs `pip install sketchfab[inspect]`)
+        :param path: Directory the model was extracted to, like the one returned by `download_to_dir`
+        """
+        from sketchfab.gltf import inspect_download
+        return inspect_download(path, self.uid, self.updated_at)
+
     def __str__(self) -> str:
         return f'Model{{{self.name}}}'
 
@@ -128,16 +220,27 @@ class SFCollection:
     [Collection of models](https://docs.sketchfab.com/data-api/v3/index.html#/collections)
     """
 
+    __slots__ = ('json', 'modified', 'clt')
+
     def __init__(self, j: Dict[str, Any] = None, clt: 'SketchFabClient' = None):
         self.json = j if j else {}
         self.modified: List[str] = []
         self.clt = clt
 
+    def set_property(self, name: str, value: Any):
+        if name not in self.modified:
+            self.modified.append(name)
+        self.json[name] = value
+
     @property
     def name(self) -> str:
         """Name of the collection"""
         return self.json.get('name')
 
+    @name.setter
+    def name(self, value: str):
+        self.set_property('name', value)
+
     @property
     def uid(self) -> str:
         """UID of the collection"""
@@ -170,6 +273,26 @@ class SFCollection:
         from sketchfab.api import SFCollectionsApi
         return SFCollectionsApi.remove_model(self.clt, self, model)
 
+    def add_models(self, models: Iterable[SFModel], **kwargs) -> Dict[str, bool]:
+        """Add many models to the collection (see `SFCollectionsApi.add_models`)"""
+        from sketchfab.api import SFCollectionsApi
+        return SFCollectionsApi.add_models(self.clt, self, models, **kwargs)
+
+    def remove_models(self, models: Iterable[SFModel], **kwargs) -> Dict[str, bool]:
+        """Remove many models from the collection (see `SFCollectionsApi.remove_models`)"""
+        from sketchfab.api import SFCollectionsApi
+        return SFCollectionsApi.remove_models(self.clt, self, models, **kwargs)
+
+    def move_models(self, dst: 'SFCollection', models: Iterable[SFModel], **kwargs) -> Dict[str, bool]:
+        """Move many models from this collection to another one (see `SFCollectionsApi.move_models`)"""
+        from sketchfab.api import SFCollectionsApi
+        return SFCollectionsApi.move_models(self.clt, self, dst, models, **kwargs)
+
+    def download_many(self, dest_dir: str, workers: int = 4, **kwargs) -> Dict[str, str]:
+        """Download all the models of the collection in parallel (see `SFModelsApi.download_many`)"""
+        from sketchfab.api import SFModelsApi
+        return SFModelsApi.download_many(self.clt, self.models(), dest_dir, workers=workers, **kwargs)
+
     def update(self) -> bool:
         """Update the collection"""
         from sketchfab.api import SFCollectionsApi
@@ -0,0 +1,163 @@
+"""
+Streaming `multipart/form-data` encoding
+"""
+import io
+import os
+import time
+import uuid
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Union
+
+UploadProgress = Callable[[int, Optional[int], float], None]
+"""Upload progress callback, called with the sent and total (if known) number of bytes and the throughput in B/s"""
+
+UploadSource = Union[str, BinaryIO, Iterable[bytes]]
+"""What can be uploaded: a file path, a binary file object or an iterator of bytes"""
+
+_HEADER_PARAM_ESCAPES = {ord('"'): '%22', ord('\r'): '%0D', ord('\n'): '%0A'}
+
+
+def header_param(name: str, value: str) -> str:
+    """`name="value"` parameter of a header, escaped like browsers (and `urllib3`) do"""
+    return f'{name}="{value.translate(_HEADER_PARAM_ESCAPES)}"'
+
+
+class MultipartEncoder:
+    """
+    Streaming `multipart/form-data` body made of some fields and one file.
+
+    It can be passed as `data` to `requests` (with its `content_type` as the `Content-Type` header), which then
+    reads it by chunks instead of building the whole body in memory. The file is read `chunk_size` bytes at a time.
+
+    When the size of the file is known the body is sent with a `Content-Length`, otherwise (e.g. for an iterator
+    of bytes) it is sent with the chunked transfer encoding.
+    """
+
+    def __init__(
+            self,
+            fields: Dict[str, str],
+            file_field: str,
+            source: UploadSource,
+            filename: str = None,
+            chunk_size: int = 1 << 20,
+            progress: UploadProgress = None,
+    ):
+        self.fields = fields
+        self.file_field = file_field
+        self.source = source
+        if filename is None:
+            filename = os.path.basename(source) if isinstance(source, str) else getattr(source, 'name', 'model')
+            filename = os.path.basename(str(filename))
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.boundary = uuid.uuid4().hex
+        self._head = self._encode_head()
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self._file_start = self._source_position()
+        file_size = self._source_size()
+        self.len = len(self._head) + file_size + len(self._tail) if file_size is not None else 0
+        """Size of the body, 0 when unknown (used by `requests` to set the `Content-Length`)"""
+        self._reset()
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def _encode_head(self) -> bytes:
+        parts = []
+        for name, value in self.fields.items():
+            parts.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; {header_param("name", name)}\r\n\r\n'
+                f'{value}\r\n'
+            )
+        parts.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; {header_param("name", self.file_field)}; '
+            f'{header_param("filename", self.filename)}\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        )
+        return ''.join(parts).encode()
+
+    def _source_position(self) -> Optional[int]:
+        if isinstance(self.source, str):
+            return 0
+        try:
+            return self.source.tell() if self.source.seekable() else None
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+    def _source_size(self) -> Optional[int]:
+        if isinstance(self.source, str):
+            return os.path.getsize(self.source)
+        if self._file_start is None:
+            return None
+        try:
+            return os.fstat(self.source.fileno()).st_size - self._file_start
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pos = self.source.tell()
+            size = self.source.seek(0, io.SEEK_END) - self._file_start
+            self.source.seek(pos)
+            return size
+
+    def _reset(self):
+        self._chunks = self._generate()
+        self._buffer = b''
+        self._offset = 0
+        self._sent = 0
+        self._started = time.monotonic()
+
+    def _file_chunks(self) -> Iterator[bytes]:
+        if isinstance(self.source, str):
+            with open(self.source, 'rb') as f:
+                yield from iter(lambda: f.read(self.chunk_size), b'')
+        elif hasattr(self.source, 'read'):
+            yield from iter(lambda: self.source.read(self.chunk_size), b'')
+        else:
+            yield from self.source
+
+    def _generate(self) -> Iterator[bytes]:
+        yield self._head
+        for chunk in self._file_chunks():
+            if chunk:
+                yield chunk
+        yield self._tail
+
+    def _advance(self, data: bytes) -> bytes:
+        self._sent += len(data)
+        if self.progress and data:
+            elapsed = time.monotonic() - self._started
+            self.progress(self._sent, self.len or None, self._sent / elapsed if elapsed else 0.0)
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        """Read at most `size` bytes of the body (at most one file chunk if `size` is negative)"""
+        if self._offset >= len(self._buffer):
+            self._buffer = next(self._chunks, b'')
+            self._offset = 0
+        end = len(self._buffer) if size is None or size < 0 else self._offset + size
+        data = self._buffer[self._offset:end]
+        self._offset += len(data)
+        return self._advance(data)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            data = self.read()
+            if not data:
+                return
+            yield data
+
+    def tell(self) -> int:
+        return self._sent
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Only rewinding is supported, so that the body can be sent again when a request is retried"""
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Can only rewind a multipart body")
+        if self._sent:
+            if not isinstance(self.source, str):
+                if self._file_start is None:
+                    raise io.UnsupportedOperation("Can't rewind a multipart body built from a non-seekable source")
+                self.source.seek(self._file_start)
+            self._reset()
+        return 0
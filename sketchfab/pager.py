@@ -0,0 +1,152 @@
+"""
+Cursor based pagination of the listing APIs
+"""
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, Optional, TypeVar
+from urllib.parse import urlparse, parse_qs
+
+from sketchfab.jsonstream import SFResultsStream
+from sketchfab.models import project
+
+T = TypeVar('T')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+"""Size of the chunks read from the listing responses, with `stream`"""
+
+
+class SFPager(Generic[T]):
+    """
+    Lazy iterator over a paginated listing.
+
+    Pages are only fetched when the previous one has been consumed (or, with `prefetch`, while it is being
+    consumed), so walking a whole account only keeps one or two pages in memory.
+
+    The `cursor` attribute holds the cursor of the page currently being iterated, and `offset` the number of items
+    of that page already returned. Saving both and passing them back to a new listing resumes the walk right after
+    the last returned item.
+
+    With `stream`, the items are decoded while each page is received (see `SFResultsStream`), so large pages are
+    never entirely held in memory. The next page is then only requested once the current one is consumed (its
+    cursor comes with it), `prefetch` doesn't apply.
+    """
+
+    def __init__(
+            self,
+            clt: 'SFClient',
+            url: str,
+            params: Dict[str, Any],
+            factory: Callable[[Dict[str, Any], 'SFClient'], T],
+            count: int = 24,
+            cursor: str = None,
+            prefetch: bool = False,
+            fields: Iterable[str] = None,
+            stream: bool = False,
+            offset: int = 0,
+    ):
+        self.clt = clt
+        self.url = url
+        self.params = params
+        self.factory = factory
+        self.count = count
+        self.cursor: Optional[str] = cursor
+        """Cursor of the page being iterated, `None` once the listing is exhausted"""
+        self.offset = offset
+        """Number of items of the current page already returned (including the one being processed)"""
+        self.prefetch = prefetch
+        self.fields = list(fields) if fields is not None else None
+        """Fields of the items to keep, all of them if `None`"""
+        self.stream = stream
+        self.exhausted = False
+        """If the last page has been reached"""
+
+    def _params(self, cursor: Optional[str]) -> Dict[str, Any]:
+        params = dict(self.params)
+        params['count'] = self.count
+        if cursor:
+            params['cursor'] = cursor
+        return params
+
+    def _fetch(self, cursor: Optional[str]) -> Dict[str, Any]:
+        r = self.clt.session.get(self.url, params=self._params(cursor))
+        r.raise_for_status()
+        return r.json()
+
+    @staticmethod
+    def _next_cursor(page: Dict[str, Any]) -> Optional[str]:
+        cursor = (page.get('cursors') or {}).get('next')
+        if cursor:
+            return cursor
+        # Some endpoints only give the URL of the next page
+        next_url = page.get('next')
+        if next_url:
+            values = parse_qs(urlparse(next_url).query).get('cursor')
+            if values:
+                return values[0]
+        return None
+
+    def pages(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the raw pages of the listing"""
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        try:
+            cursor = self.cursor
+            page = self._fetch(cursor)
+            while True:
+                next_cursor = self._next_cursor(page)
+                future: Optional[Future] = None
+                if next_cursor and executor:
+                    future = executor.submit(self._fetch, next_cursor)
+
+                self.cursor = cursor
+                yield page
+
+                if not next_cursor:
+                    self.cursor = None
+                    self.exhausted = True
+                    return
+
+                cursor = next_cursor
+                page = future.result() if future else self._fetch(cursor)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def _iter_stream(self) -> Iterator[T]:
+        cursor = self.cursor
+        skip = self.offset
+        while True:
+            r = self.clt.session.get(self.url, params=self._params(cursor), stream=True)
+            try:
+                r.raise_for_status()
+                stream = SFResultsStream(r.iter_content(STREAM_CHUNK_SIZE), fields=self.fields)
+                self.cursor = cursor
+                self.offset = skip
+                for i, item in enumerate(stream):
+                    if i < skip:
+                        continue
+                    self.offset = i + 1
+                    yield self.factory(item, self.clt)
+            finally:
+                r.close()
+
+            skip = 0
+            cursor = self._next_cursor(stream.rest)
+            if not cursor:
+                self.cursor = None
+                self.exhausted = True
+                return
+
+    def __iter__(self) -> Iterator[T]:
+        if self.stream:
+            yield from self._iter_stream()
+            return
+        skip = self.offset
+        for page in self.pages():
+            self.offset = skip
+            for i, item in enumerate(page.get('results', [])):
+                if i < skip:
+                    continue
+                if self.fields is not None:
+                    item = project(item, self.fields)
+                self.offset = i + 1
+                yield self.factory(item, self.clt)
+            skip = 0
@@ -0,0 +1,131 @@
+"""
+Read-only file object over HTTP range requests
+"""
+import io
+from typing import Optional, Sequence
+
+import requests
+
+from sketchfab.metrics import SFHooks, call_hooks
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    Seekable file fetching its content on demand with HTTP `Range` requests.
+
+    Data is fetched by blocks. Sequential reads double the block size (up to `max_block_size`) so that reading
+    a large member of an archive only takes a few requests, while random reads (like the ones `zipfile` does to
+    read the central directory) only fetch what they need.
+
+    Each fetched block is reported to the `on_download_chunk` hooks.
+    """
+
+    def __init__(
+            self,
+            session: requests.Session,
+            url: str,
+            size: int,
+            block_size: int = 1 << 16,
+            max_block_size: int = 1 << 24,
+            hooks: Sequence[SFHooks] = (),
+            uid: str = None,
+    ):
+        """
+        :param session: Session to send the requests with
+        :param url: URL of the file
+        :param size: Size of the file
+        :param block_size: Size of the first block fetched, and of the blocks fetched by random reads
+        :param max_block_size: Maximum size of the blocks fetched by sequential reads
+        :param hooks: Hooks to report the fetched blocks to
+        :param uid: uid of the model of the file, for the hooks
+        """
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.hooks = hooks
+        self.uid = uid
+        self.size = size
+        self.min_block_size = block_size
+        self.block_size = block_size
+        self.max_block_size = max_block_size
+        self.requests = 0
+        """Number of range requests performed"""
+        self._pos = 0
+        self._block_start = 0
+        self._block = b''
+
+    @staticmethod
+    def open(
+            session: requests.Session,
+            url: str,
+            tail_size: int = 1 << 16,
+            hooks: Sequence[SFHooks] = (),
+            uid: str = None,
+    ) -> Optional['HTTPRangeFile']:
+        """
+        Open a remote file, fetching its last bytes (where archives keep their index) along the way.
+        :return: The file or `None` if the server doesn't support range requests
+        """
+        with session.get(url, headers={'Range': f'bytes=-{tail_size}'}, stream=True) as r:
+            r.raise_for_status()
+            if r.status_code != requests.codes.partial_content or '/' not in r.headers.get('content-range', ''):
+                return None
+            total = r.headers['content-range'].rsplit('/', 1)[1]
+            if not total.isdigit():
+                return None
+            f = HTTPRangeFile(session, url, int(total), hooks=hooks, uid=uid)
+            f._block = r.content
+            f._block_start = f.size - len(f._block)
+            f.requests = 1
+            call_hooks(hooks, 'on_download_chunk', uid, len(f._block))
+            return f
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        """Fetch the [start, end) range"""
+        r = self.session.get(self.url, headers={'Range': f'bytes={start}-{end - 1}'})
+        r.raise_for_status()
+        self.requests += 1
+        if r.status_code != requests.codes.partial_content:
+            raise IOError(f"Range request not honored for {self.url}")
+        call_hooks(self.hooks, 'on_download_chunk', self.uid, len(r.content))
+        return r.content
+
+    def readinto(self, b) -> int:
+        n = min(len(b), self.size - self._pos)
+        if n <= 0:
+            return 0
+        pos = self._pos
+        block_end = self._block_start + len(self._block)
+        if pos < self._block_start or pos + n > block_end:
+            if pos == block_end:
+                # Sequential read: read ahead more
+                self.block_size = min(self.block_size * 2, self.max_block_size)
+            else:
+                self.block_size = self.min_block_size
+            self._block_start = pos
+            self._block = self._fetch(pos, min(pos + max(n, self.block_size), self.size))
+        offset = pos - self._block_start
+        data = self._block[offset:offset + n]
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
@@ -0,0 +1,160 @@
+"""
+Client-side rate limiting of the API requests
+"""
+import email.utils
+import logging
+import threading
+import time
+from typing import Dict, List, Mapping, Optional
+
+import requests
+
+from sketchfab.metrics import SFHookedAdapter, call_hooks, endpoint_of
+
+LANES: List[str] = ['metadata', 'download']
+"""Request lanes, by decreasing priority"""
+
+
+class SFScheduler:
+    """
+    Rate limiter shared by all the threads (and possibly all the clients) doing API requests.
+
+    It is a token bucket allowing `rate` requests per second on average and bursts of `burst` requests. When
+    requests are waiting in several lanes, the ones of the lane of highest priority are served first.
+
+    When the API says we're going too fast (a 429 response with a `Retry-After` header or exhausted
+    `X-RateLimit-*` headers), every lane is paused until the announced time, so that all the threads back off
+    together instead of each one on its own.
+
+    The `download` lane only holds the API requests asking for a download URL (`/models/{uid}/download`). The
+    archives are then fetched from the storage servers, which aren't subject to the API rate limit, with the download
+    session of the client which doesn't go through the scheduler.
+    """
+
+    def __init__(self, rate: float = None, burst: int = None):
+        """
+        :param rate: Average number of requests per second, unlimited if not specified
+        :param burst: Size of the bucket, `rate` (or 1) if not specified
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate or 1))
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _has_priority(self, lane: str) -> bool:
+        for other in LANES:
+            if other == lane:
+                return True
+            if self._waiting[other]:
+                return False
+        return True
+
+    def acquire(self, lane: str = 'metadata'):
+        """Wait until a request can be sent in a lane"""
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now < self._paused_until:
+                        self._cond.wait(self._paused_until - now)
+                        continue
+                    if not self.rate:
+                        return
+                    self._refill(now)
+                    if self._tokens >= 1 and self._has_priority(lane):
+                        self._tokens -= 1
+                        return
+                    self._cond.wait(max((1 - self._tokens) / self.rate, 0.001))
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Stop sending requests for some time"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @staticmethod
+    def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+        """Parse the `Retry-After` header (in seconds or as an HTTP date)"""
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def observe(self, r: requests.Response, default_delay: float = 1) -> Optional[float]:
+        """
+        Take the rate limiting headers of a response into account
+        :return: The time (in seconds) we were asked to wait, if any
+        """
+        delay = None
+        if r.status_code == requests.codes.too_many_requests:
+            delay = self.retry_after(r.headers)
+            if delay is None:
+                delay = default_delay
+        elif r.headers.get('x-ratelimit-remaining') == '0' and r.headers.get('x-ratelimit-reset', '').isdigit():
+            reset = int(r.headers['x-ratelimit-reset'])
+            # Either a timestamp or a number of seconds
+            delay = max(0.0, reset - time.time()) if reset > 1e9 else float(reset)
+        if delay:
+            logging.info("Rate limited by the API, pausing requests for %.1fs", delay)
+            self.pause(delay)
+        return delay
+
+    @staticmethod
+    def lane_for(request: requests.PreparedRequest) -> str:
+        return 'download' if request.path_url.split('?')[0].endswith('/download') else 'metadata'
+
+
+class SFSchedulingAdapter(SFHookedAdapter):
+    """
+    Transport adapter sending the requests through a `SFScheduler` (and calling the hooks).
+
+    429 responses are retried (whatever the method, as the request wasn't processed) once the scheduler allows it.
+    Other retries are left to `max_retries`, which should only allow idempotent methods.
+    """
+
+    def __init__(self, scheduler: SFScheduler, max_rate_limited_retries: int = 10, **kwargs):
+        self.scheduler = scheduler
+        self.max_rate_limited_retries = max_rate_limited_retries
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _rewind(request: requests.PreparedRequest) -> bool:
+        body = request.body
+        if body is None or isinstance(body, (bytes, str)):
+            return True
+        try:
+            body.seek(0)
+            return True
+        except (AttributeError, OSError):
+            return False
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:  # pylint: disable=arguments-differ
+        lane = self.scheduler.lane_for(request)
+        attempt = 0
+        while True:
+            self.scheduler.acquire(lane)
+            r = super().send(request, **kwargs)
+            self.scheduler.observe(r)
+            if r.status_code != requests.codes.too_many_requests or attempt >= self.max_rate_limited_retries \
+                    or not self._rewind(request):
+                return r
+            attempt += 1
+            r.close()
+            call_hooks(self.hooks, 'on_retry', request.method, endpoint_of(request.url, self.api), r.status_code,
+                       'rate limited')
@@ -0,0 +1,306 @@
+"""
+Durable write-behind queue of the mutations
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sketchfab.api import SFCollectionsApi, SFModelsApi
+from sketchfab.models import SFCollection, SFModel
+
+COMMENT = 'comment'
+PATCH = 'patch'
+ADD = 'add'
+REMOVE = 'remove'
+
+PENDING = 'pending'
+RUNNING = 'running'
+FAILED = 'failed'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS mutations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    model TEXT,
+    data TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_at REAL NOT NULL DEFAULT 0,
+    error TEXT
+)
+'''
+
+Row = Tuple[int, str, str, Optional[str], Optional[str], int]
+"""id, kind, target, model, data, attempts"""
+
+
+class SFWriteBehind:
+    """
+    Queue of mutations (comments, model updates and collection changes) which are accepted immediately, journaled in
+    a SQLite database and sent in the background.
+
+    Mutations are coalesced while they wait: the updates of a model are merged in a single PATCH, and adding then
+    removing a model from a collection (or the opposite) cancels out, as the model is expected to end up where it
+    was. The collection changes are sent by batches of `batch_size` models.
+
+    Failed mutations are retried with an exponential backoff, and given up after `max_attempts` (they are kept in
+    the journal, see `failed`). Mutations of the same model (or collection change) are sent in order. Mutations
+    which weren't sent when the process stopped are replayed by the next queue opened on the same journal.
+
+    ```python
+    with clt.write_behind('mutations.sqlite') as queue:
+        model.tags = ['kitchen']
+        queue.update_model(model)
+        queue.add_model(collection, model)
+        queue.comment(model, 'Checked !')
+    ```
+    """
+
+    def __init__(
+            self,
+            clt: 'SFClient',
+            path: str = ':memory:',
+            workers: int = 4,
+            batch_size: int = 50,
+            max_attempts: int = 5,
+            retry_delay: float = 1.0,
+    ):
+        """
+        :param clt: Client
+        :param path: Path of the SQLite journal, the mutations are lost with the process if not specified
+        :param workers: Number of requests sent in parallel
+        :param batch_size: Maximum number of models added to (or removed from) a collection per request
+        :param max_attempts: Number of attempts of a mutation before giving up on it
+        :param retry_delay: Delay (in seconds) before the first retry, doubled on each attempt
+        """
+        self.clt = clt
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # With a write-ahead log, a mutation is journaled without waiting for the disk, and survives a crash of
+        # the process (but not of the system)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(_SCHEMA)
+        # Mutations being sent when the previous process stopped are sent again
+        self._db.execute('UPDATE mutations SET state = ? WHERE state = ?', (PENDING, RUNNING))
+        self._cond = threading.Condition()
+        self._running: Set[Tuple[str, str, Optional[str]]] = set()
+        """Keys of the mutations being sent"""
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._thread = threading.Thread(target=self._drain, name='sketchfab-write-behind', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _key(kind: str, target: str, model: Optional[str]) -> Tuple[str, str, Optional[str]]:
+        """Mutations with the same key are sent in order: the ones of a model, or of a model in a collection"""
+        if kind in (ADD, REMOVE):
+            return ADD, target, model
+        return 'model', target, None
+
+    def _enqueue(self, kind: str, target: str, model: str = None, data: str = None):
+        with self._cond:
+            assert not self._closed, "The queue is closed"
+            self._db.execute('INSERT INTO mutations (kind, target, model, data) VALUES (?, ?, ?, ?)',
+                             (kind, target, model, data))
+            self._cond.notify_all()
+
+    def _pending_row(self, kinds: Tuple[str, ...], target: str, model: str = None) -> Optional[Tuple[int, str, str]]:
+        return self._db.execute(
+            f'SELECT id, kind, data FROM mutations WHERE state = ? AND kind IN ({", ".join("?" * len(kinds))}) '
+            'AND target = ? AND model IS ? ORDER BY id DESC LIMIT 1',
+            (PENDING, *kinds, target, model),
+        ).fetchone()
+
+    def comment(self, model: SFModel, msg: str):
+        """Post a comment on a model"""
+        self._enqueue(COMMENT, model.uid, data=msg)
+
+    def update_model(self, model: SFModel):
+        """Update the modified properties of a model (see `SFModelsApi.update_model`)"""
+        changes = model.changes()
+        model.modified = []
+        if not changes:
+            return
+        with self._cond:
+            row = self._pending_row((PATCH,), model.uid)
+            if row:
+                merged = dict(json.loads(row[2]), **changes)
+                self._db.execute('UPDATE mutations SET data = ? WHERE id = ?', (json.dumps(merged), row[0]))
+            else:
+                self._enqueue(PATCH, model.uid, data=json.dumps(changes))
+
+    def _change_model(self, kind: str, collection: SFCollection, model: SFModel):
+        with self._cond:
+            row = self._pending_row((ADD, REMOVE), collection.uid, model.uid)
+            if not row:
+                self._enqueue(kind, collection.uid, model.uid)
+            elif row[1] != kind:
+                self._db.execute('DELETE FROM mutations WHERE id = ?', (row[0],))
+                self._cond.notify_all()
+
+    def add_model(self, collection: SFCollection, model: SFModel):
+        """Add a model to a collection"""
+        self._change_model(ADD, collection, model)
+
+    def remove_model(self, collection: SFCollection, model: SFModel):
+        """Remove a model from a collection"""
+        self._change_model(REMOVE, collection, model)
+
+    def pending(self) -> int:
+        """Number of mutations waiting to be sent (or being sent)"""
+        with self._cond:
+            return self._db.execute('SELECT COUNT(*) FROM mutations WHERE state != ?', (FAILED,)).fetchone()[0]
+
+    def failed(self) -> List[Dict[str, Any]]:
+        """Mutations that were given up, with their last error"""
+        with self._cond:
+            rows = self._db.execute(
+                'SELECT id, kind, target, model, data, attempts, error FROM mutations WHERE state = ? ORDER BY id',
+                (FAILED,),
+            ).fetchall()
+        keys = ['id', 'kind', 'target', 'model', 'data', 'attempts', 'error']
+        return [dict(zip(keys, row)) for row in rows]
+
+    def retry_failed(self):
+        """Send the mutations that were given up again"""
+        with self._cond:
+            self._db.execute('UPDATE mutations SET state = ?, attempts = 0, next_at = 0 WHERE state = ?',
+                             (PENDING, FAILED))
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait for the queued mutations to be sent (or given up)
+        :return: If the queue is empty
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._db.execute('SELECT 1 FROM mutations WHERE state != ? LIMIT 1', (FAILED,)).fetchone():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, wait: bool = True):
+        """
+        Stop sending the mutations, the ones which weren't sent stay in the journal
+        :param wait: Wait for the queue to be empty first
+        """
+        if wait:
+            self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self._db.close()
+
+    def __enter__(self) -> 'SFWriteBehind':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _ready(self) -> Tuple[List[Row], Optional[float]]:
+        """Mutations to send now, and the delay until the next retry"""
+        now = time.time()
+        rows = []
+        # Mutations being sent, or waiting for a retry, hold back the next ones with the same key
+        blocked = set(self._running)
+        for row in self._db.execute(
+                'SELECT id, kind, target, model, data, attempts, next_at FROM mutations WHERE state = ? ORDER BY id',
+                (PENDING,),
+        ):
+            key = self._key(row[1], row[2], row[3])
+            if key in blocked:
+                continue
+            blocked.add(key)
+            if row[6] > now:
+                continue
+            self._running.add(key)
+            rows.append(row[:6])
+        next_at = self._db.execute('SELECT MIN(next_at) FROM mutations WHERE state = ? AND next_at > ?',
+                                   (PENDING, now)).fetchone()[0]
+        for row in rows:
+            self._db.execute('UPDATE mutations SET state = ? WHERE id = ?', (RUNNING, row[0]))
+        return rows, None if next_at is None else next_at - now
+
+    def _tasks(self, rows: List[Row]) -> List[Tuple[Callable[[], Dict[int, bool]], List[Row]]]:
+        """Group the mutations in requests"""
+        tasks = []
+        changes: Dict[Tuple[str, str], List[Row]] = {}
+        for row in rows:
+            row_id, kind, target, model, data, _ = row
+            if kind == COMMENT:
+                tasks.append((self._send_comment(row_id, target, data), [row]))
+            elif kind == PATCH:
+                tasks.append((self._send_patch(row_id, target, data), [row]))
+            else:
+                changes.setdefault((kind, target), []).append(row)
+        for (kind, target), change_rows in changes.items():
+            for i in range(0, len(change_rows), self.batch_size):
+                chunk = change_rows[i:i + self.batch_size]
+                tasks.append((self._send_changes(kind, target, chunk), chunk))
+        return tasks
+
+    def _send_comment(self, row_id: int, uid: str, msg: str) -> Callable[[], Dict[int, bool]]:
+        return lambda: {row_id: SFModelsApi.comment(self.clt, SFModel({'uid': uid}, self.clt), msg)}
+
+    def _send_patch(self, row_id: int, uid: str, data: str) -> Callable[[], Dict[int, bool]]:
+        return lambda: {
+            row_id: SFModelsApi._patch_model(self.clt, uid, SFModelsApi._encode_update_data(json.loads(data)))
+        }
+
+    def _send_changes(self, kind: str, collection_uid: str, rows: List[Row]) -> Callable[[], Dict[int, bool]]:
+        def send():
+            method = 'POST' if kind == ADD else 'DELETE'
+            collection = SFCollection({'uid': collection_uid}, self.clt)
+            results = SFCollectionsApi._change_models(self.clt, method, collection, [row[3] for row in rows])
+            return {row[0]: results.get(row[3], False) for row in rows}
+        return send
+
+    def _run(self, send: Callable[[], Dict[int, bool]], rows: List[Row]):
+        try:
+            results = send()
+            error = 'Rejected by the API'
+        except Exception as e:  # pylint: disable=broad-except
+            results = {}
+            error = str(e)
+        with self._cond:
+            for row_id, kind, target, model, _, attempts in rows:
+                self._running.discard(self._key(kind, target, model))
+                if results.get(row_id):
+                    self._db.execute('DELETE FROM mutations WHERE id = ?', (row_id,))
+                elif attempts + 1 >= self.max_attempts:
+                    logging.warning("Giving up %s of %s %s after %d attempts: %s", kind, target, model or '',
+                                    attempts + 1, error)
+                    self._db.execute('UPDATE mutations SET state = ?, attempts = ?, error = ? WHERE id = ?',
+                                     (FAILED, attempts + 1, error, row_id))
+                else:
+                    self._db.execute(
+                        'UPDATE mutations SET state = ?, attempts = ?, next_at = ?, error = ? WHERE id = ?',
+                        (PENDING, attempts + 1, time.time() + self.retry_delay * 2 ** attempts, error, row_id),
+                    )
+            self._cond.notify_all()
+
+    def _drain(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                rows, delay = self._ready()
+                if not rows:
+                    self._cond.wait(delay)
+                    continue
+            for send, task_rows in self._tasks(rows):
+                self._executor.submit(self._run, send, task_rows)
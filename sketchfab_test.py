@@ -55,3 +55,669 @@ class SketchFabTest(unittest.TestCase):
             coll_models.add_model(m)
             coll_updates.remove_model(m)
             m.comment("Downloaded !")
+
+    @staticmethod
+    def test_iter_models():
+        clt = SFClient()
+        pager = clt.iter_models(count=2, prefetch=True)
+        uids = [m.uid for m in pager]
+        assert len(uids) == len(set(uids))
+        assert pager.exhausted
+
+    @staticmethod
+    def test_async_client():
+        import asyncio
+        from sketchfab.aio import AsyncSFClient
+
+        async def run():
+            async with AsyncSFClient() as clt:
+                models = await clt.list_mines()
+                if models:
+                    fetched = await asyncio.gather(*[clt.get_model(m.uid) for m in models])
+                    assert [m.uid for m in fetched] == [m.uid for m in models]
+
+        asyncio.run(run())
+
+    @staticmethod
+    def test_download_many():
+        import tempfile
+        clt = SFClient()
+        models = clt.models(downloadable=True)[:3]
+        paths = clt.download_many(models, tempfile.mkdtemp(), workers=3)
+        assert set(paths) == {m.uid for m in models}
+
+    @staticmethod
+    def test_import_time():
+        import subprocess
+        import sys
+        code = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import sketchfab\n"
+            "print(time.perf_counter() - start, 'requests' in sys.modules, sketchfab.VERSION)\n"
+        )
+        out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+        duration, requests_imported, _ = out.split()
+        assert requests_imported == 'False'
+        assert float(duration) < 0.05
+
+    @staticmethod
+    def test_fake_server():
+        import tempfile
+        from benchmarks.fake_server import FakeSketchfab
+
+        with FakeSketchfab(models=30, collections=2, archive_size=1000, rate_limit_every=5, retry_after=0) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            models = clt.models()
+            assert len({m.uid for m in models}) == 30
+            model = clt.get_model(models[0].uid)
+            model.name = 'renamed'
+            assert model.update()
+            assert server.models[model.uid]['name'] == 'renamed'
+            assert len(clt.get_collection_by_name('collection 0').models()) == 15
+            paths = clt.download_many(models[:3], tempfile.mkdtemp())
+            assert set(paths) == {m.uid for m in models[:3]}
+            assert server.rate_limited
+
+    @staticmethod
+    def test_bulk_update():
+        from urllib3.util.retry import Retry
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.models import SFModel
+
+        with FakeSketchfab(models=3) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            # The dropped request fails right away instead of being retried
+            clt.session.get_adapter(server.api_url).max_retries = Retry(0)
+            renamed, described, unchanged = clt.models()
+            same = SFModel(dict(renamed.json), clt)
+            renamed.name = 'renamed'
+            same.description = 'described'
+            unchanged.name = unchanged.name
+            described.description = 'described'
+            server.broken.add(f'/v3/models/{described.uid}')
+            requests = server.requests
+            results = clt.bulk_update([renamed, same, unchanged, described])
+            assert results == {renamed.uid: True, unchanged.uid: True, described.uid: False}
+            # The changes of the same model are merged, a model without changes isn't sent
+            assert server.requests - requests == 2
+            assert server.models[renamed.uid]['name'] == 'renamed'
+            assert server.models[renamed.uid]['description'] == 'described'
+            assert not renamed.modified and not same.modified and not unchanged.modified
+            assert described.modified == ['description']
+
+    @staticmethod
+    def test_download_resume():
+        import json
+        import os
+        import tempfile
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.api import SFModelsApi
+        from sketchfab.metrics import SFMetrics
+
+        with FakeSketchfab(models=1, archive_size=1 << 18) as server:
+            metrics = SFMetrics()
+            clt = SFClient('fake', api_url=server.api_url, hooks=[metrics])
+            model = clt.models()[0]
+            dest_dir = tempfile.mkdtemp()
+            path = os.path.join(dest_dir, f'{model.uid}.zip')
+            half = len(server.archive) // 2
+
+            def interrupted(content: bytes):
+                with open(f'{path}.part', 'wb') as f:
+                    f.write(content)
+                with open(f'{path}.json', 'w') as f:
+                    json.dump({'uid': model.uid, 'updatedAt': model.updated_at, 'complete': False}, f)
+                os.remove(path)
+
+            # Resumed from the part file
+            SFModelsApi.download(clt, model, dest_dir)
+            interrupted(server.archive[:half])
+            downloaded = metrics.downloaded
+            assert SFModelsApi.download(clt, model, dest_dir) == path
+            assert metrics.downloaded - downloaded == len(server.archive) - half
+            with open(path, 'rb') as f:
+                assert f.read() == server.archive
+
+            # The part file was complete (416)
+            interrupted(server.archive)
+            downloaded = metrics.downloaded
+            SFModelsApi.download(clt, model, dest_dir)
+            assert metrics.downloaded == downloaded and os.path.getsize(path) == len(server.archive)
+
+            # Unchanged models aren't downloaded again
+            archive_requests = sum('/archives/' in p for _, _, p in server.log)
+            SFModelsApi.download(clt, model, dest_dir)
+            assert sum('/archives/' in p for _, _, p in server.log) == archive_requests
+
+            # A corrupted part file doesn't match the checksum
+            interrupted(b'x' * half)
+            try:
+                SFModelsApi.download(clt, model, dest_dir)
+                assert False, "The checksum should have been checked"
+            except IOError as e:
+                assert 'Checksum' in str(e)
+            assert not os.path.exists(f'{path}.part')
+
+            # Temporary downloads don't leave a sidecar behind
+            path = SFModelsApi.download(clt, model)
+            assert not os.path.exists(f'{path}.json')
+            os.remove(path)
+            try:
+                SFModelsApi.download(clt, model, dest_dir, attempts=0)
+                assert False, "At least one attempt is needed"
+            except ValueError:
+                pass
+
+    @staticmethod
+    def test_multipart():
+        import io
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.multipart import MultipartEncoder
+
+        # The header parameters are escaped
+        body = MultipartEncoder({'name': 'x'}, 'modelFile', io.BytesIO(b'data'), filename='a"b\r\nX-Injected: 1.zip')
+        head = body.read(1 << 16)
+        assert b'filename="a%22b%0D%0AX-Injected: 1.zip"' in head and b'\r\nX-Injected' not in head
+
+        # A file object is rewound for a retry, with the progress reported again
+        progress = []
+        body = MultipartEncoder({}, 'modelFile', io.BytesIO(b'0123456789'), chunk_size=4,
+                                progress=lambda sent, total, throughput: progress.append((sent, total)))
+        first = b''.join(body)
+        assert progress[-1] == (body.len, body.len) and len(first) == body.len
+        reported = len(progress)
+        body.seek(0)
+        assert b''.join(body) == first
+        assert progress[reported:] == progress[:reported]
+
+        # An iterator is sent with the chunked encoding, without a known size, and can't be rewound
+        body = MultipartEncoder({}, 'modelFile', iter([b'ab', b'cd']))
+        assert body.len == 0 and b'abcd' in b''.join(body)
+        try:
+            body.seek(0)
+            assert False, "An iterator can't be rewound"
+        except io.UnsupportedOperation:
+            pass
+        with FakeSketchfab() as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            assert clt.upload_model(iter([b'x' * 1000] * 10), None, filename='model.zip')
+            assert server.uploads[0] > 10000
+
+    @staticmethod
+    def test_scheduler():
+        import threading
+        import time
+        import requests
+        from sketchfab.scheduler import SFScheduler
+
+        # Token bucket: a burst, then `rate` requests per second
+        scheduler = SFScheduler(rate=20, burst=5)
+        start = time.monotonic()
+        for _ in range(15):
+            scheduler.acquire()
+        assert 0.45 <= time.monotonic() - start < 1
+
+        # The metadata requests go before the downloads waiting for longer
+        scheduler = SFScheduler(rate=10, burst=1)
+        scheduler.acquire()
+        order = []
+        threads = []
+        for lane in 'download', 'metadata':
+            threads.append(threading.Thread(target=lambda l=lane: (scheduler.acquire(l), order.append(l))))
+            threads[-1].start()
+            time.sleep(0.02)
+        for t in threads:
+            t.join()
+        assert order == ['metadata', 'download']
+
+        # The requests are paused as asked by the API
+        paused = (429, {'Retry-After': '1'}), (200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1'})
+        for status, headers in paused:
+            scheduler = SFScheduler()
+            r = requests.Response()
+            r.status_code = status
+            r.headers.update(headers)
+            assert scheduler.observe(r) == 1
+            start = time.monotonic()
+            scheduler.acquire('download')
+            assert time.monotonic() - start >= 0.9
+
+    @staticmethod
+    def test_batch_update_script():
+        import json
+        import os
+        import subprocess
+        import sys
+        from benchmarks.fake_server import FakeSketchfab
+
+        with FakeSketchfab(models=2) as server:
+            first, second = server.models
+            root = os.path.dirname(os.path.abspath(__file__))
+            p = subprocess.run(
+                [sys.executable, os.path.join(root, 'scripts', 'sketchfab'), '--api-url', server.api_url,
+                 'batch_update', '--name', 'batch'],
+                input=f'{first}\n{{"uid": "{second}", "name": "own"}}\nunknown\n{{invalid\n',
+                stdout=subprocess.PIPE, universal_newlines=True, timeout=60,
+                env=dict(os.environ, SKETCHFAB_API_TOKEN='fake', PYTHONPATH=root),
+            )
+            assert p.returncode == 1
+            results = {r.get('uid', r.get('line')): r for r in map(json.loads, p.stdout.splitlines())}
+            assert {k: r['ok'] for k, r in results.items()} == {first: True, second: True, 'unknown': False,
+                                                                 '{invalid': False}
+            assert server.models[first]['name'] == 'batch'
+            assert server.models[second]['name'] == 'own'
+
+    @staticmethod
+    def test_async_download():
+        import asyncio
+        import os
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.aio import AsyncSFClient
+
+        async def run(server):
+            async with AsyncSFClient('fake', api_url=server.api_url) as clt:
+                models = await asyncio.gather(*[clt.get_model(uid) for uid in server.models])
+                return await asyncio.gather(*[clt.download(m, chunk_size=1024) for m in models])
+
+        with FakeSketchfab(models=3) as server:
+            for path in asyncio.run(run(server)):
+                with open(path, 'rb') as f:
+                    assert f.read() == server.archive
+                os.remove(path)
+
+    @staticmethod
+    def test_pager_resume():
+        import itertools
+        from benchmarks.fake_server import FakeSketchfab
+
+        with FakeSketchfab(models=30) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            uids = [m.uid for m in clt.iter_models(count=7)]
+            for stream in False, True:
+                pager = clt.iter_models(count=7, stream=stream)
+                seen = [m.uid for m in itertools.islice(pager, 10)]
+                resumed = clt.iter_models(count=7, stream=stream, cursor=pager.cursor, offset=pager.offset)
+                assert seen + [m.uid for m in resumed] == uids
+
+    @staticmethod
+    def test_upload_many():
+        import os
+        import tempfile
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.api import SFProcessingWatcher
+
+        src_dir = tempfile.mkdtemp()
+        paths = []
+        for i in range(6):
+            paths.append(os.path.join(src_dir, f'model{i}.zip'))
+            with open(paths[-1], 'wb') as f:
+                f.write(b'model %d' % i)
+
+        with FakeSketchfab(models=30, processing_time=0.2) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            def metadata(path):
+                # The last file takes longer to upload
+                time.sleep(0.8 if path == paths[-1] else 0)
+
+            start = time.monotonic()
+            results = []
+            for path, model in clt.upload_many(paths, metadata, workers=6, min_interval=0.1, max_interval=0.2):
+                results.append((path, model, time.monotonic() - start))
+            assert sorted(r[0] for r in results) == sorted(paths)
+            assert all(r[1].processing_status == 'SUCCEEDED' for r in results)
+            # The other models are processed while the last file is being uploaded
+            assert results[-1][0] == paths[-1]
+            assert all(r[2] < 0.8 for r in results[:-1])
+            # Each polling round is a single listing request, not a request per model
+            assert server.requests < len(paths) + 15
+
+            # Threads waiting for their own models share the polling rounds
+            watcher = SFProcessingWatcher(clt, min_interval=0.1, max_interval=0.2)
+            requests = server.requests
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                models = list(executor.map(lambda path: watcher.wait(clt.upload_model(path, None)), paths))
+            assert all(m.processing_status == 'SUCCEEDED' for m in models)
+            assert server.requests - requests < len(paths) + 10
+
+    @staticmethod
+    def test_metrics_errors():
+        import socket
+        import requests
+        from sketchfab.metrics import SFHookedAdapter, SFMetrics
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            url = f'http://127.0.0.1:{sock.getsockname()[1]}/v3/models'
+        metrics = SFMetrics()
+        session = requests.Session()
+        session.mount('http://', SFHookedAdapter([metrics]))
+        try:
+            session.get(url)
+            assert False, "The connection should have been refused"
+        except requests.ConnectionError:
+            pass
+        stats = metrics.as_dict()['endpoints']['GET /models']
+        assert stats['count'] == 1 and stats['statuses'] == {0: 1}
+        assert stats['errors'] == {'ConnectionError': 1}
+        assert 'sketchfab_request_errors_total{method="GET",endpoint="/models",error="ConnectionError"} 1' in \
+            metrics.to_prometheus()
+
+    @staticmethod
+    def test_processing_deleted():
+        import io
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.api import SFModelsApi
+
+        with FakeSketchfab(models=480, processing_time=0.2) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            kept = clt.upload_model(io.BytesIO(b'kept'), None, filename='kept.zip')
+            deleted = clt.upload_model(io.BytesIO(b'deleted'), None, filename='deleted.zip')
+            del server.models[deleted.uid]
+            requests = server.requests
+            waited = SFModelsApi.wait_for_processing(clt, [kept, deleted], min_interval=0.1, max_interval=0.1)
+            models = {m.uid: m for m in waited}
+            assert models[kept.uid].processing_status == 'SUCCEEDED'
+            assert models[deleted.uid].processing_status is None
+            # The listing stops at the models created before the watched ones
+            assert server.requests - requests < 10
+
+    @staticmethod
+    def test_metrics_download():
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.metrics import SFMetrics
+
+        with FakeSketchfab(models=1, archive_size=1 << 18) as server:
+            metrics = SFMetrics()
+            clt = SFClient('fake', api_url=server.api_url, hooks=[metrics])
+            model = clt.models()[0]
+            model.download_to_dir()
+            streamed = metrics.downloaded
+            assert streamed > 0
+            model.download_to_dir(stream=False)
+            assert metrics.downloaded - streamed == len(server.archive)
+
+    @staticmethod
+    def test_mirror():
+        import os
+        import tempfile
+        from benchmarks.fake_server import FakeSketchfab
+
+        dest_dir = tempfile.mkdtemp()
+        with FakeSketchfab(models=5, archive_size=1000) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            assert len(clt.mirror(dest_dir).added) == 5
+            uids = list(server.models)
+            del server.models[uids[0]]
+            server.models[uids[1]]['updatedAt'] = '2030-01-01T00:00:00'
+            report = clt.mirror(dest_dir)
+            assert report.deleted == [uids[0]] and not report.added and not report.updated
+            assert os.path.isdir(os.path.join(dest_dir, '.deleted', uids[0]))
+            # Locks left without a valid pid are stale
+            for content in '', '0', 'garbage':
+                with open(os.path.join(dest_dir, '.sketchfab-mirror.json.lock'), 'w') as f:
+                    f.write(content)
+                assert not clt.mirror(dest_dir).added
+
+    @staticmethod
+    def test_upload_dedup():
+        import io
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.dedup import SFUploadIndex
+
+        with FakeSketchfab() as server:
+            clt = SFClient('fake', api_url=server.api_url, upload_index=SFUploadIndex())
+            first = clt.upload_model(io.BytesIO(b'model'), None, filename='model.zip')
+            second = clt.upload_model(io.BytesIO(b'model'), None, filename='model.zip')
+            assert first.uid == second.uid
+            assert len(server.uploads) == 1
+
+    @staticmethod
+    def test_request_coalescing():
+        from concurrent.futures import ThreadPoolExecutor
+        from benchmarks.fake_server import FakeSketchfab
+
+        with FakeSketchfab(models=1, latency=0.1) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            uid = list(server.models)[0]
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                models = list(executor.map(clt.get_model, [uid] * 8))
+            assert all(m.uid == uid for m in models)
+            assert server.requests == 1
+
+    @staticmethod
+    def test_model_cache():
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.cache import SFModelCache
+
+        with FakeSketchfab(models=1) as server:
+            clt = SFClient('fake', api_url=server.api_url, cache=SFModelCache())
+            uid = list(server.models)[0]
+            assert clt.get_model(uid).name == clt.get_model(uid).name
+            assert server.requests == 1
+            server.models[uid]['name'] = 'renamed'
+            assert clt.get_model(uid).name != 'renamed'
+            assert (clt.cache.hits, clt.cache.misses) == (2, 1)
+            assert clt.get_model(uid, use_cache=False).name == 'renamed'
+            # Bypassing the cache isn't a miss
+            assert clt.cache.misses == 1
+            assert clt.get_model(uid).name == 'renamed'
+            assert server.requests == 2
+
+    @staticmethod
+    def test_collection_bisect():
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.models import SFModel
+
+        with FakeSketchfab(models=8) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            collection = clt.create_collection('bisect', [])
+            models = clt.models() + [SFModel({'uid': 'unknown'}, clt)]
+            results = collection.add_models(models, chunk_size=9)
+            assert results == dict({m.uid: True for m in models[:-1]}, unknown=False)
+            assert sorted(server.collection_models[collection.uid]) == sorted(m.uid for m in models[:-1])
+
+    @staticmethod
+    def test_collection_move():
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.models import SFModel
+
+        with FakeSketchfab(models=5) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            models = clt.models()
+            src = clt.create_collection('updates', models)
+            dst = clt.create_collection('models', [])
+            results = src.move_models(dst, models[:3] + [SFModel({'uid': 'unknown'}, clt)], chunk_size=2)
+            assert results == dict({m.uid: True for m in models[:3]}, unknown=False)
+            assert sorted(server.collection_models[src.uid]) == sorted(m.uid for m in models[3:])
+            assert sorted(server.collection_models[dst.uid]) == sorted(m.uid for m in models[:3])
+
+    @staticmethod
+    def test_crawl():
+        import datetime
+        import os
+        import tempfile
+        from benchmarks.fake_server import FakeSketchfab
+
+        with FakeSketchfab(models=500, max_results=48) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            checkpoint = os.path.join(tempfile.mkdtemp(), 'crawl.json')
+            models = []
+            emitted = clt.crawl_public(datetime.date(2019, 1, 1), sink=models.append, end=datetime.date(2019, 2, 1),
+                                       checkpoint=checkpoint, result_cap=48, fields=['name'])
+            assert emitted == len(server.models)
+            assert sorted(m.uid for m in models) == sorted(server.models)
+            # Resuming a finished crawl doesn't fetch anything
+            assert clt.crawl_public(datetime.date(2019, 1, 1), checkpoint=checkpoint, result_cap=48) == 0
+
+            # An interrupted crawl resumes without emitting the same models again, whatever the sink
+            checkpoint = os.path.join(tempfile.mkdtemp(), 'crawl.json')
+            first, second = [], []
+
+            def interrupted(model):
+                if len(first) >= 100:
+                    raise KeyboardInterrupt
+                first.append(model.uid)
+
+            try:
+                clt.crawl_public(datetime.date(2019, 1, 1), sink=interrupted, end=datetime.date(2019, 2, 1),
+                                 checkpoint=checkpoint, result_cap=48)
+                assert False, "The crawl should have been interrupted"
+            except KeyboardInterrupt:
+                pass
+            clt.crawl_public(datetime.date(2019, 1, 1), sink=lambda m: second.append(m.uid),
+                             end=datetime.date(2019, 2, 1), checkpoint=checkpoint, result_cap=48)
+            assert not set(first) & set(second)
+            assert sorted(first + second) == sorted(server.models)
+
+    @staticmethod
+    def test_streaming_listing():
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.jsonstream import SFResultsStream
+
+        body = b'{"results": [{"uid": "a", "name": "x"}, {"uid": "b", "name": "y"}], "cursors": {"next": "12"}}'
+        stream = SFResultsStream([body[i:i + 5] for i in range(0, len(body), 5)], fields=['uid'])
+        assert list(stream) == [{'uid': 'a'}, {'uid': 'b'}]
+        assert stream.rest['cursors'] == {'next': '12'}
+
+        with FakeSketchfab(models=100) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            models = list(clt.iter_models(count=24, stream=True, fields=['uid', 'name']))
+            assert [m.uid for m in models] == [m.uid for m in clt.iter_models(count=24)]
+            assert set(models[0].json) == {'uid', 'name'}
+
+    @staticmethod
+    def test_write_behind():
+        import os
+        import tempfile
+        import time
+        from benchmarks.fake_server import FakeSketchfab
+
+        with FakeSketchfab(models=20) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            collection = clt.create_collection('write-behind', [])
+            models = clt.models()
+            path = os.path.join(tempfile.mkdtemp(), 'mutations.sqlite')
+            with clt.write_behind(path, max_attempts=1) as queue:
+                for m in models:
+                    queue.add_model(collection, m)
+                queue.remove_model(collection, models[0])
+                models[1].name = 'renamed'
+                queue.update_model(models[1])
+                models[1].description = 'described'
+                queue.update_model(models[1])
+                queue.comment(models[1], 'Checked !')
+            assert sorted(server.collection_models[collection.uid]) == sorted(m.uid for m in models[1:])
+            assert server.models[models[1].uid]['name'] == 'renamed'
+            assert server.models[models[1].uid]['description'] == 'described'
+            assert len(server.comments) == 1
+
+            # A mutation waiting for a retry holds back the next ones of the same model
+            removed = server.models.pop(models[2].uid)
+            with clt.write_behind(path, retry_delay=0.2) as queue:
+                queue.comment(models[2], 'first')
+                # Refused, as the model doesn't exist yet
+                time.sleep(0.1)
+                server.models[models[2].uid] = removed
+                queue.comment(models[2], 'second')
+            assert [c['body'] for c in server.comments[1:]] == ['first', 'second']
+
+            # A comment waits for the update of its model queued before it
+            server.latency = 0.1
+            with clt.write_behind(path) as queue:
+                models[4].name = 'commented'
+                queue.update_model(models[4])
+                queue.comment(models[4], 'After the update')
+            server.latency = 0
+            (patched_at,) = [t for t, method, p in server.log if method == 'PATCH' and p.endswith(models[4].uid)]
+            assert server.log[-1][1:] == ('POST', '/v3/comments')
+            assert server.log[-1][0] - patched_at >= 0.1
+
+            # The mutations which weren't sent are replayed by the next queue on the journal
+            removed = server.models.pop(models[3].uid)
+            queue = clt.write_behind(path, retry_delay=0.2)
+            queue.comment(models[3], 'replayed')
+            time.sleep(0.1)
+            queue.close(wait=False)
+            assert server.comments[-1]['body'] != 'replayed'
+            server.models[models[3].uid] = removed
+            with clt.write_behind(path) as queue:
+                assert queue.pending() == 1
+            assert server.comments[-1]['body'] == 'replayed'
+
+    @staticmethod
+    def test_inspect_download():
+        import base64
+        import json
+        import os
+        import struct
+        import tempfile
+        from benchmarks.fake_server import FakeSketchfab
+        from sketchfab.gltf import SIDECAR, SFGltfInspector, inspect_download
+
+        with FakeSketchfab(models=1, archive_size=1 << 16) as server:
+            clt = SFClient('fake', api_url=server.api_url)
+            model = clt.models()[0]
+            path = model.download_to_dir()
+            stats = model.inspect_download(path)
+            assert stats.buffer_bytes == 1 << 16
+            assert os.path.exists(os.path.join(path, SIDECAR))
+            assert model.inspect_download(path).json == stats.json
+
+        # Positions interleaved with normals, an indexed mesh drawn twice and a PNG and a JPEG image
+        vertices = [(0, 0, 0), (1, 0, 0), (0, 2, 0), (0, 0, 3)]
+        interleaved = b''.join(struct.pack('<3f3f', *v, 0, 0, 1) for v in vertices)
+        indices = struct.pack('<9H', 0, 1, 2, 0, 2, 3, 1, 1, 2) + b'\0\0'
+        png = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 7, 5) + bytes(9)
+        jpeg = b'\xff\xd8\xff\xe0\x00\x04\x00\x00\xff\xc0\x00\x11\x08' + struct.pack('>HH', 3, 4) + bytes(12)
+        binary = interleaved + indices + png + bytes(-len(png) % 4)
+        gltf = {
+            'asset': {'version': '2.0'},
+            'buffers': [{'byteLength': len(binary), 'uri': 'scene.bin'}],
+            'bufferViews': [
+                {'buffer': 0, 'byteOffset': 0, 'byteLength': len(interleaved), 'byteStride': 24},
+                {'buffer': 0, 'byteOffset': len(interleaved), 'byteLength': 18},
+                {'buffer': 0, 'byteOffset': len(interleaved) + len(indices), 'byteLength': len(png)},
+            ],
+            'accessors': [
+                {'bufferView': 0, 'componentType': 5126, 'count': 4, 'type': 'VEC3'},
+                {'bufferView': 0, 'byteOffset': 12, 'componentType': 5126, 'count': 4, 'type': 'VEC3'},
+                {'bufferView': 1, 'componentType': 5123, 'count': 9, 'type': 'SCALAR'},
+            ],
+            'meshes': [{'primitives': [{'attributes': {'POSITION': 0, 'NORMAL': 1}, 'indices': 2, 'material': 0}]}],
+            'materials': [{}],
+            'nodes': [{'translation': [10, 0, 0], 'children': [1]}, {'scale': [2, 2, 2], 'mesh': 0}, {'mesh': 0}],
+            'scenes': [{'nodes': [0, 2]}],
+            'images': [
+                {'bufferView': 2, 'mimeType': 'image/png'},
+                {'uri': 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode(), 'mimeType': 'image/jpeg'},
+            ],
+        }
+        asset_dir = tempfile.mkdtemp()
+        with open(os.path.join(asset_dir, 'scene.bin'), 'wb') as f:
+            f.write(binary)
+        with open(os.path.join(asset_dir, 'scene.gltf'), 'w') as f:
+            json.dump(gltf, f)
+        del gltf['buffers'][0]['uri']
+        chunk = json.dumps(gltf).encode()
+        chunk += b' ' * (-len(chunk) % 4)
+        glb_path = os.path.join(tempfile.mkdtemp(), 'model.glb')
+        with open(glb_path, 'wb') as f:
+            f.write(struct.pack('<4sII', b'glTF', 2, 12 + 8 + len(chunk) + 8 + len(binary)))
+            f.write(struct.pack('<II', len(chunk), 0x4E4F534A) + chunk)
+            f.write(struct.pack('<II', len(binary), 0x004E4942) + binary)
+
+        normals = SFGltfInspector(asset_dir).accessor(1)
+        assert normals.strides == (24, 4) and normals.tolist() == [[0, 0, 1]] * 4
+        for asset in asset_dir, glb_path:
+            stats = inspect_download(asset)
+            assert (stats.vertices, stats.triangles, stats.degenerate_triangles) == (8, 6, 2)
+            assert (stats.draw_calls, stats.meshes, stats.materials) == (2, 1, 1)
+            assert stats.bounds == [[0, 0, 0], [12, 4, 6]]
+            assert [(t['width'], t['height']) for t in stats.textures] == [(7, 5), (4, 3)]
+            assert stats.buffer_bytes == len(binary)
+        # Without an update date, the statistics couldn't be invalidated and aren't cached
+        inspect_download(asset_dir, 'uid', None)
+        assert not os.path.exists(os.path.join(asset_dir, SIDECAR))